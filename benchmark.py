@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Bluesky & Mastodon Auto-Poster
+
+Usage:
+    python benchmark.py startup [--runs N]
+    python benchmark.py metadata [--runs N] [--latency MS]
+    python benchmark.py images [--runs N]
+    python benchmark.py queue [--lines N] [--runs N]
+    python benchmark.py posts [--runs N] [--latency MS]
+    python benchmark.py all
+
+startup: times a full "python main.py" run against an empty queue (the most
+common cron invocation) and compares it with the same run when the heavy
+dependencies are imported up front, as the script used to do.
+
+metadata, images, queue and posts exercise main.py's own functions against
+local stand-in servers (a fake Bluesky PDS, a fake Mastodon instance and a
+static site with og:image pages), so nothing touches the real networks.
+--latency adds a fixed delay to every fake server response.
+"""
+
+import os
+import sys
+import argparse
+import base64
+import contextlib
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+# Dummy credentials so main() gets past its configuration checks
+BENCHMARK_ENV = {
+    'BLUESKY_HANDLE': 'benchmark.bsky.social',
+    'BLUESKY_PASSWORD': 'benchmark-password',
+    'MASTODON_INSTANCE_URL': 'https://mastodon.invalid',
+    'MASTODON_ACCESS_TOKEN': 'benchmark-token',
+}
+
+# What main.py imported at module level before imports were made lazy
+EAGER_IMPORTS = 'import atproto, mastodon, requests; from PIL import Image'
+
+def time_command(command, cwd, env, runs):
+    """Run command runs times and return the wall time of each run in seconds"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def print_timings(label, timings):
+    """Print the median and spread of a set of timings"""
+    print(f"{label:<28} median {statistics.median(timings) * 1000:8.1f} ms"
+          f"   min {min(timings) * 1000:8.1f} ms   max {max(timings) * 1000:8.1f} ms")
+
+class FakeServerHandler(BaseHTTPRequestHandler):
+    """Base handler for the stand-in servers: routes requests to methods, adds latency, stays quiet"""
+    
+    latency = 0.0  # Seconds added to every response
+    routes = ()  # (HTTP method, path prefix, handler method name)
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def send_body(self, body, content_type='application/json', status=200, headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+    
+    def route(self, method):
+        if self.latency:
+            time.sleep(self.latency)
+        if method in ('POST', 'PUT'):
+            self.request_body = self.read_body()
+        for route_method, prefix, handler in self.routes:
+            if route_method == method and self.path.startswith(prefix):
+                return getattr(self, handler)()
+        self.send_body({'error': 'NotFound', 'message': self.path}, status=404)
+    
+    def do_GET(self):
+        self.route('GET')
+    
+    def do_POST(self):
+        self.route('POST')
+
+def fake_jwt(subject):
+    """Return an unsigned JWT that the atproto client accepts as a one-hour access token"""
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).rstrip(b'=').decode('ascii')
+    
+    now = int(time.time())
+    payload = {'scope': 'com.atproto.access', 'sub': subject, 'iat': now, 'exp': now + 3600}
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(payload)}.c2lnbmF0dXJl"
+
+class FakePDSHandler(FakeServerHandler):
+    """Stand-in for a Bluesky PDS: login, profile, blob upload and record creation"""
+    
+    did = 'did:plc:benchmark'
+    routes = (
+        ('POST', '/xrpc/com.atproto.server.createSession', 'create_session'),
+        ('GET', '/xrpc/app.bsky.actor.getProfile', 'get_profile'),
+        ('POST', '/xrpc/com.atproto.repo.uploadBlob', 'upload_blob'),
+        ('POST', '/xrpc/com.atproto.repo.createRecord', 'create_record'),
+    )
+    
+    def create_session(self):
+        handle = json.loads(self.request_body)['identifier']
+        self.send_body({'did': self.did, 'handle': handle, 'accessJwt': fake_jwt(self.did),
+                        'refreshJwt': fake_jwt(self.did), 'active': True})
+    
+    def get_profile(self):
+        self.send_body({'did': self.did, 'handle': 'benchmark.bsky.social'})
+    
+    def upload_blob(self):
+        self.send_body({'blob': {
+            '$type': 'blob',
+            'ref': {'$link': 'bafkreibme22gw2h7y2h7tg2fhqotaqjucnbc24deqo72b6mkl2egezxhvy'},
+            'mimeType': self.headers.get('Content-Type', 'image/jpeg'),
+            'size': len(self.request_body),
+        }})
+    
+    def create_record(self):
+        rkey = f"{random.getrandbits(64):016x}"
+        self.send_body({'uri': f"at://{self.did}/app.bsky.feed.post/{rkey}",
+                        'cid': 'bafyreibme22gw2h7y2h7tg2fhqotaqjucnbc24deqo72b6mkl2egezxhvy'})
+
+class FakeMastodonHandler(FakeServerHandler):
+    """Stand-in for a Mastodon instance: credentials check, media upload and status creation"""
+    
+    routes = (
+        ('GET', '/api/v1/instance', 'instance'),
+        ('GET', '/api/v1/accounts/verify_credentials', 'verify_credentials'),
+        ('POST', '/api/v2/media', 'upload_media_async'),
+        ('POST', '/api/v1/media', 'upload_media'),
+        ('GET', '/api/v1/media/', 'get_media'),
+        ('POST', '/api/v1/statuses', 'post_status'),
+    )
+    
+    def instance(self):
+        self.send_body({'uri': 'mastodon.benchmark', 'title': 'Benchmark', 'version': '4.2.0',
+                        'urls': {}, 'stats': {}, 'languages': ['en'], 'contact_account': None, 'rules': []})
+    
+    def verify_credentials(self):
+        self.send_body({'id': '1', 'username': 'benchmark', 'acct': 'benchmark', 'display_name': 'Benchmark',
+                        'url': 'http://mastodon.benchmark/@benchmark', 'created_at': '2024-01-01T00:00:00.000Z'})
+    
+    def media_entity(self, media_id):
+        return {'id': media_id, 'type': 'image', 'url': f"http://mastodon.benchmark/media/{media_id}.jpg",
+                'preview_url': f"http://mastodon.benchmark/media/{media_id}_small.jpg", 'description': None}
+    
+    def upload_media(self):
+        self.send_body(self.media_entity(str(random.getrandbits(32))))
+    
+    def upload_media_async(self):
+        # Like a real instance, v2 accepts the file and finishes processing in the background
+        self.send_body(dict(self.media_entity(str(random.getrandbits(32))), url=None), status=202)
+    
+    def get_media(self):
+        self.send_body(self.media_entity(self.path.rsplit('/', 1)[-1]))
+    
+    def post_status(self):
+        status_id = str(random.getrandbits(48))
+        self.send_body({'id': status_id, 'url': f"http://mastodon.benchmark/@benchmark/{status_id}",
+                        'uri': f"http://mastodon.benchmark/statuses/{status_id}", 'content': '',
+                        'created_at': '2024-01-01T00:00:00.000Z', 'visibility': 'public',
+                        'media_attachments': [], 'mentions': [], 'tags': [], 'emojis': []})
+
+class StaticSiteHandler(FakeServerHandler):
+    """Stand-in website: /page/<n> is an article with og: tags, /img/<n>.jpg its featured image"""
+    
+    image = b''  # JPEG served for every /img/ path
+    routes = (
+        ('GET', '/page/', 'page'),
+        ('GET', '/img/', 'image_file'),
+    )
+    
+    def page(self):
+        number = self.path.rsplit('/', 1)[-1]
+        etag = f'"page-{number}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        paragraphs = ''.join(f"<p>Paragraph {i} of the benchmark article body.</p>" for i in range(2000))
+        html = (
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Benchmark page {number}</title>"
+            f"<meta property=\"og:title\" content=\"Benchmark article {number}\">"
+            f"<meta property=\"og:description\" content=\"A page served to measure link preview fetching.\">"
+            f"<meta property=\"og:image\" content=\"/img/{number}.jpg\">"
+            f"</head><body>{paragraphs}</body></html>"
+        )
+        self.send_body(html.encode('utf-8'), 'text/html; charset=utf-8', headers={'ETag': etag})
+    
+    def image_file(self):
+        # Trailing bytes after the JPEG end marker make every image new to the caches
+        self.send_body(self.image + self.path.encode('ascii'), 'image/jpeg')
+
+def sample_image(size=(3000, 2000), seed=0):
+    """Return a photo-like JPEG: a gradient with noise, so it doesn't compress unrealistically well"""
+    from PIL import Image, ImageFilter
+    
+    noise = Image.frombytes('RGB', (size[0] // 4, size[1] // 4), random.Random(seed).randbytes(size[0] * size[1] * 3 // 16))
+    img = noise.resize(size, Image.Resampling.BICUBIC).filter(ImageFilter.GaussianBlur(2))
+    img_bytes = BytesIO()
+    img.save(img_bytes, format='JPEG', quality=92)
+    return img_bytes.getvalue()
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threaded server that ignores clients hanging up mid-response (the metadata reader stops after <head>)"""
+    
+    daemon_threads = True
+    
+    def handle_error(self, request, client_address):
+        pass
+
+def start_server(handler, latency):
+    """Serve handler on a random localhost port in a background thread and return its base URL"""
+    handler_class = type(handler.__name__, (handler,), {'latency': latency})
+    server = QuietHTTPServer(('127.0.0.1', 0), handler_class)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def start_fake_servers(latency):
+    """Start the fake PDS, Mastodon instance and website, returning their base URLs"""
+    StaticSiteHandler.image = sample_image()
+    return {
+        'pds': start_server(FakePDSHandler, latency),
+        'mastodon': start_server(FakeMastodonHandler, latency),
+        'site': start_server(StaticSiteHandler, latency),
+    }
+
+def write_targets(path, servers):
+    """Write a targets.json that posts to the fake servers"""
+    config = {'targets': [
+        {'name': 'Bluesky', 'platform': 'bluesky', 'handle': 'benchmark.bsky.social',
+         'password': 'benchmark-password', 'service': f"{servers['pds']}/xrpc"},
+        {'name': 'Mastodon', 'platform': 'mastodon', 'instance_url': servers['mastodon'],
+         'access_token': 'benchmark-token'},
+    ]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+
+def import_main(workdir):
+    """Import main.py with its files (queue, caches, sessions) placed in workdir"""
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(MAIN_SCRIPT))
+    import main
+    return main
+
+def time_call(func, runs):
+    """Call func() runs times and return the wall time of each call in seconds, hiding its output"""
+    timings = []
+    with contextlib.redirect_stdout(open(os.devnull, 'w')) as devnull:
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        devnull.close()
+    return timings
+
+def bench_startup(runs):
+    """Compare empty-queue startup time with lazy and eager dependency imports"""
+    env = dict(os.environ, **BENCHMARK_ENV)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        open(os.path.join(workdir, 'topost.txt'), 'w').close()
+
+        # Warm the OS file cache and bytecode caches before measuring
+        time_command([sys.executable, MAIN_SCRIPT], workdir, env, 1)
+        time_command([sys.executable, '-c', EAGER_IMPORTS], workdir, env, 1)
+
+        baseline = time_command([sys.executable, '-c', 'pass'], workdir, env, runs)
+        lazy = time_command([sys.executable, MAIN_SCRIPT], workdir, env, runs)
+        eager = time_command(
+            [sys.executable, '-c', f"{EAGER_IMPORTS}; import runpy; runpy.run_path({MAIN_SCRIPT!r}, run_name='__main__')"],
+            workdir, env, runs
+        )
+
+    print(f"Empty-queue startup, {runs} runs each:")
+    print_timings("python -c pass", baseline)
+    print_timings("main.py (lazy imports)", lazy)
+    print_timings("main.py (eager imports)", eager)
+
+    saved = statistics.median(eager) - statistics.median(lazy)
+    print(f"✓ Lazy imports save {saved * 1000:.1f} ms per empty-queue run")
+
+def bench_metadata(runs, latency):
+    """Time link preview fetching: a cold fetch, a fresh cache hit and a 304 revalidation"""
+    servers = start_fake_servers(latency)
+    with tempfile.TemporaryDirectory() as workdir:
+        main = import_main(workdir)
+        urls = iter(f"{servers['site']}/page/{i}" for i in range(runs * 2))
+        
+        cold_urls = [next(urls) for _ in range(runs)]
+        cold = time_call(lambda: main.fetch_page_metadata(cold_urls.pop()), runs)
+        cached = time_call(lambda: main.fetch_page_metadata(f"{servers['site']}/page/0"), runs)
+        
+        ttl = main.METADATA_CACHE_TTL
+        main.METADATA_CACHE_TTL = 0
+        revalidated = time_call(lambda: main.fetch_page_metadata(f"{servers['site']}/page/0"), runs)
+        main.METADATA_CACHE_TTL = ttl
+    
+    print(f"fetch_page_metadata, {runs} runs each, {latency * 1000:g} ms server latency:")
+    print_timings("cold fetch", cold)
+    print_timings("cache hit", cached)
+    print_timings("304 revalidation", revalidated)
+
+def bench_images(runs):
+    """Time the image pipeline for one and four images, with and without the processed image cache"""
+    with tempfile.TemporaryDirectory() as workdir:
+        main = import_main(workdir)
+        platforms = tuple(main.IMAGE_CONSTRAINTS)
+        sources = iter([sample_image(seed=seed) for seed in range(runs * 5)])
+        
+        if main.IMAGE_PROCESS_WORKERS > 1:
+            main.get_image_pool()  # Start the worker processes outside the measurement
+        single = time_call(lambda: main.process_images([next(sources)], platforms), runs)
+        four = time_call(lambda: main.process_images([next(sources) for _ in range(4)], platforms), runs)
+        cached_sources = [sample_image(seed=-1)]
+        main.process_images(cached_sources, platforms)
+        cached = time_call(lambda: main.process_images(cached_sources, platforms), runs)
+        
+        # A photo that is already small enough for every platform
+        from PIL import Image
+        os.makedirs('images')
+        Image.open(BytesIO(sample_image())).resize(main.IMAGE_MAX_SIZE).save(os.path.join('images', 'fits.jpg'), quality=85)
+        unchanged = time_call(lambda: main.load_local_images(['fits.jpg'], platforms), runs)
+    
+    print(f"process_images (3000x2000 JPEG source, {len(platforms)} platforms), {runs} runs each:")
+    print_timings("1 image", single)
+    print_timings("4 images", four)
+    print_timings("1 image, cached", cached)
+    print_timings("local image within limits", unchanged)
+
+def bench_queue(lines, runs):
+    """Time taking items off the head of a large topost.txt"""
+    with tempfile.TemporaryDirectory() as workdir:
+        main = import_main(workdir)
+        with open(main.TOPOST_FILE, 'w', encoding='utf-8') as f:
+            for i in range(lines):
+                f.write(f"https://example.com/articles/{i} | Queued benchmark item number {i}\n")
+        
+        def dequeue():
+            line, position = main.read_first_line()
+            main.commit_position(position)
+        
+        timings = time_call(dequeue, runs)
+        peek = time_call(lambda: main.peek_queue(10), runs)
+    
+    print(f"Queue of {lines} lines, {runs} runs each:")
+    print_timings("read + commit head line", timings)
+    print_timings("peek next 10 lines", peek)
+
+def bench_posts(runs, latency):
+    """Measure steady-state posting throughput against the fake servers, as in daemon mode
+    
+    Logins and library imports happen in a warm-up post first, so only the
+    per-item work (metadata, images, uploads, posts, queue updates) is timed.
+    """
+    servers = start_fake_servers(latency)
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        write_targets(os.path.join(workdir, 'targets.json'), servers)
+        main = import_main(workdir)
+        main.TARGETS_FILE = 'targets.json'
+        # Measure the posting pipeline, not the client-side pacing of API calls
+        main.RATE_LIMITS = {platform: (10 ** 9, 10 ** 6) for platform in main.RATE_LIMITS}
+        targets = main.load_targets()
+        clients = {}
+        
+        os.makedirs('images')
+        photo = sample_image(seed=100)
+        for i in range(runs * 5):
+            with open(os.path.join('images', f"photo{i}.jpg"), 'wb') as f:
+                f.write(photo + str(i).encode('ascii'))  # Trailing bytes make each file new to the image cache
+        
+        kinds = {
+            'text': lambda i: f"Benchmark status update number {i}",
+            'link': lambda i: f"{servers['site']}/page/{i} | Benchmark link {i}",
+            'image': lambda i: f"photo{i}.jpg | Benchmark photo {i}",
+            '4 images': lambda i: f"{', '.join(f'photo{runs + i * 4 + j}.jpg' for j in range(4))} | Benchmark album {i}",
+        }
+        
+        def post(line):
+            with open(main.TOPOST_FILE, 'w', encoding='utf-8') as f:
+                f.write(line + '\n')
+            line, position = main.read_first_line()
+            if not main.post_line(targets, line, position, clients):
+                raise RuntimeError(f"posting failed: {line}")
+        
+        time_call(lambda: post("Benchmark warm-up post"), 1)
+        
+        print(f"Posting to {len(targets)} targets after warm-up, {runs} items each, {latency * 1000:g} ms server latency:")
+        for kind, make_line in kinds.items():
+            lines = iter([make_line(i) for i in range(runs)])
+            timings = time_call(lambda: post(next(lines)), runs)
+            print_timings(f"{kind} post", timings)
+            print(f"{'':<28} {runs / sum(timings):8.1f} posts/s")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmarks for the auto-poster")
+    parser.add_argument('benchmark', choices=('startup', 'metadata', 'images', 'queue', 'posts', 'all'),
+                        help="benchmark to run")
+    parser.add_argument('--runs', type=int, default=10, help="repetitions per measurement (default: 10)")
+    parser.add_argument('--latency', type=float, default=0, metavar='MS',
+                        help="delay added to every fake server response, in milliseconds (default: 0)")
+    parser.add_argument('--lines', type=int, default=100000, help="queue length for the queue benchmark (default: 100000)")
+    args = parser.parse_args()
+    latency = args.latency / 1000
+    
+    if args.benchmark in ('startup', 'all'):
+        bench_startup(args.runs)
+    if args.benchmark in ('metadata', 'all'):
+        bench_metadata(args.runs, latency)
+    if args.benchmark in ('images', 'all'):
+        bench_images(args.runs)
+    if args.benchmark in ('queue', 'all'):
+        bench_queue(args.lines, args.runs)
+    if args.benchmark in ('posts', 'all'):
+        bench_posts(args.runs, latency)
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,40 @@
 """
 Bluesky & Mastodon Auto-Poster Script with Link Embeds and Featured Images
 
-This script reads the first line from "topost.txt", posts it to both Bluesky and Mastodon
-with proper link embedding and featured images, removes it from the file, 
+This script reads the next line from "topost.txt", posts it to both Bluesky and Mastodon
+with proper link embedding and featured images, marks it as posted, 
 and appends it to "posted.txt".
 
 Requirements:
-- pip install atproto requests beautifulsoup4 pillow Mastodon.py
+- pip install atproto requests pillow Mastodon.py
 - Set your Bluesky and Mastodon credentials in environment variables
 """
 
 import os
 import sys
-import requests
+import time
+import argparse
+import atexit
+import json
+import heapq
+import hashlib
+import uuid
+import re
+import codecs
+import unicodedata
+from html.parser import HTMLParser
+import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
 from io import BytesIO
-from PIL import Image
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from atproto import Client, models
-from mastodon import Mastodon
-from bs4 import BeautifulSoup
+# The heavy dependencies (atproto, Mastodon.py, Pillow, requests) are imported
+# inside the functions that need them, so text posts and empty-queue runs
+# don't pay for loading SDKs and image libraries they never use.
 
 # Bluesky Configuration
 BLUESKY_HANDLE = os.getenv('BLUESKY_HANDLE', 'your-handle.bsky.social')
@@ -32,37 +45,568 @@ BLUESKY_PASSWORD = os.getenv('BLUESKY_PASSWORD', 'your-app-password')
 MASTODON_INSTANCE_URL = os.getenv('MASTODON_INSTANCE_URL', 'https://mastodon.social')
 MASTODON_ACCESS_TOKEN = os.getenv('MASTODON_ACCESS_TOKEN', 'your-access-token')
 
+# Posting targets: a JSON file listing any number of Bluesky and Mastodon
+# accounts. When it doesn't exist, the single accounts above are used.
+TARGETS_FILE = os.getenv('POSTER_TARGETS_FILE', 'targets.json')
+MAX_POST_WORKERS = int(os.getenv('POSTER_MAX_WORKERS', 8))  # Targets posted to at the same time
+
+# API rate limits per account: (sustained calls per hour, burst)
+RATE_LIMITS = {
+    'bluesky': (1500, 10),   # 5000 points/hour, 3 points per record created
+    'mastodon': (3600, 10),  # 300 requests per 5 minutes
+}
+RATE_LIMIT_MAX_WAIT = int(os.getenv('RATE_LIMIT_MAX_WAIT', 15 * 60))  # Longest wait for a reset, in seconds
+RATE_LIMIT_RETRIES = 3  # Rate-limit rejections waited out per API call
+
 # File Configuration
 TOPOST_FILE = 'topost.txt'
 POSTED_FILE = 'posted.txt'
+CURSOR_FILE = 'topost.cursor'  # Byte offset of the next unposted line in topost.txt
+DELIVERY_LEDGER_FILE = 'deliveries.sqlite'  # Per-target delivery state of each queue item
+
+# Optional schedule prefix on queue lines: '@2026-05-01T09:30 ...' or '@09:30 ...'
+SCHEDULE_PATTERN = re.compile(r'^@(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2})?|\d{2}:\d{2})\s+(.*)$')
+
+# Daemon mode
+DAEMON_POLL_INTERVAL = 30  # Seconds between checks for newly queued lines
+DAEMON_RETRY_DELAY = 5 * 60  # Seconds before retrying an item that failed on every target
+
+# Retries of targets that failed an item another target already received
+MAX_DELIVERY_ATTEMPTS = 5
+DELIVERY_RETRY_BASE = 60  # Seconds before the first retry, doubled after each failure
+DELIVERY_RETRY_MAX = 6 * 60 * 60
+
+# Cache Configuration
+CACHE_DIR = os.getenv('POSTER_CACHE_DIR', '.cache')
+METADATA_CACHE_FILE = os.path.join(CACHE_DIR, 'metadata.sqlite')
+METADATA_CACHE_TTL = int(os.getenv('METADATA_CACHE_TTL', 24 * 60 * 60))  # Seconds before revalidating a page
+METADATA_CACHE_MAX_ENTRIES = int(os.getenv('METADATA_CACHE_MAX_ENTRIES', 5000))
+IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, 'images')
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_MB', 500)) * 1024 * 1024
+
+# Duplicate detection: items whose URL, images or text were posted within
+# this many days are skipped (0 disables the check)
+REPOST_WINDOW_DAYS = float(os.getenv('POSTER_REPOST_WINDOW_DAYS', 30))
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref_src')  # Ignored when comparing URLs
+POSTED_LINE_PATTERN = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (.*)$')  # A posted.txt entry
+POSTED_INDEX_FILE = os.path.join(CACHE_DIR, 'posted_index.sqlite')  # Lookup index over posted.txt
+
+# Session reuse
+MASTODON_VERIFIED_FILE = os.path.join(CACHE_DIR, 'mastodon_verified.json')
+MASTODON_VERIFY_TTL = int(os.getenv('MASTODON_VERIFY_TTL', 24 * 60 * 60))  # Seconds to trust a credential check
+
+# Image processing (both platforms have size limits)
+IMAGE_MAX_SIZE = (1200, 1200)
+IMAGE_MAX_QUALITY = 85  # JPEG/WebP quality used whenever the result fits the size limit
+IMAGE_MIN_QUALITY = 40  # Lowest quality tried before shrinking the image further
+IMAGE_MAX_SHRINKS = 3  # Times an image is scaled down by a quarter when even the lowest quality is too large
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 64000000))  # Larger linked images are refused before decoding
+REMOTE_IMAGE_MAX_BYTES = int(os.getenv('REMOTE_IMAGE_MAX_BYTES', 20 * 1024 * 1024))  # Download limit for linked images
+
+EXIF_ORIENTATION = 0x0112
+EXIF_GPS_INFO = 0x8825
+
+# What each platform accepts for uploaded images
+IMAGE_CONSTRAINTS = {
+    'bluesky': {'max_bytes': 1000000, 'max_size': IMAGE_MAX_SIZE, 'formats': ('JPEG', 'PNG', 'WEBP')},
+    'mastodon': {'max_bytes': 8 * 1024 * 1024, 'max_size': IMAGE_MAX_SIZE, 'formats': ('JPEG', 'PNG', 'GIF', 'WEBP')},
+}
+MAX_IMAGES_PER_POST = 4  # Limit on both Bluesky and Mastodon
+IMAGE_PROCESS_WORKERS = min(MAX_IMAGES_PER_POST, os.cpu_count() or 1)  # Processes resizing a post's images
+MASTODON_MEDIA_TIMEOUT = int(os.getenv('MASTODON_MEDIA_TIMEOUT', 60))  # Seconds to wait for media processing
+MASTODON_MEDIA_POLL_INTERVAL = 0.25  # Seconds before the first processing check, growing by half after each
+MASTODON_MEDIA_MAX_POLL_INTERVAL = 5  # Longest wait between processing checks
+
+# HTTP Configuration (web scraping)
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 3))  # Retries on connection errors, 429 and 5xx
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))  # Exponential backoff base, in seconds
+HTTP_MAX_RETRY_AFTER = 60  # Never honor a Retry-After longer than this, in seconds
+HTTP_PER_HOST_LIMIT = int(os.getenv('HTTP_PER_HOST_LIMIT', 4))  # Concurrent requests per host
+HTTP_DRAIN_MAX_BYTES = 64 * 1024  # Unread body left to skip so a connection can be reused, rather than dropped
+
+# Instrumentation
+TIMING_LOG_FILE = os.getenv('POSTER_TIMING_LOG')  # JSON lines file for per-stage timings ('-' for stderr)
+METRICS_FILE = os.getenv('POSTER_METRICS_FILE')  # Prometheus text file with per-stage latency histograms
+METRICS_STATE_FILE = os.path.join(CACHE_DIR, 'metrics.sqlite')  # Histogram totals across runs
+METRICS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # Seconds
+
+# Number of queue items prepared in parallel by the prefetch command
+PREFETCH_WORKERS = 4
+
+# Queue check command
+CHECK_WORKERS = 32  # Links and images checked at the same time
+CHECK_REPORT_FILE = 'queue_check.json'
+POST_LENGTH_LIMITS = {'bluesky': 300, 'mastodon': int(os.getenv('MASTODON_MAX_CHARACTERS', 500))}  # In graphemes
+MASTODON_URL_LENGTH = 23  # Mastodon counts every link as this many characters
+
+# Stop reading a page after this many bytes if </head> hasn't been reached
+METADATA_MAX_BYTES = 512 * 1024
 
 # User agent for web scraping
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 
-def read_first_line():
-    """Read and return the first line from topost.txt"""
+def atomic_write(path, data):
+    """Durably replace path with data (write temp file, fsync, rename)
+    
+    An existing file keeps its permissions; a new one is readable only by
+    the current user.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.')
+    try:
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    
+    # Persist the rename itself (not supported on every platform)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+# Timings recorded by this process and not yet written to METRICS_STATE_FILE,
+# keyed by (stage, platform, status) -> [count, sum, bucket counts]
+_pending_metrics = {}
+_metrics_lock = threading.Lock()
+
+def record_span(stage, platform, duration, status, fields):
+    """Log one timed stage as a JSON line and add it to the latency histograms"""
+    if TIMING_LOG_FILE:
+        record = {'ts': round(time.time(), 3), 'stage': stage, 'platform': platform,
+                  'duration_ms': round(duration * 1000, 1), 'status': status, **fields}
+        line = json.dumps(record, default=str) + '\n'
+        with _metrics_lock:
+            if TIMING_LOG_FILE == '-':
+                sys.stderr.write(line)
+            else:
+                with open(TIMING_LOG_FILE, 'a', encoding='utf-8') as f:
+                    f.write(line)
+    
+    if METRICS_FILE:
+        with _metrics_lock:
+            entry = _pending_metrics.setdefault((stage, platform, status), [0, 0.0, [0] * len(METRICS_BUCKETS)])
+            entry[0] += 1
+            entry[1] += duration
+            for i, bound in enumerate(METRICS_BUCKETS):
+                if duration <= bound:
+                    entry[2][i] += 1
+
+@contextmanager
+def timed(stage, platform='', **fields):
+    """Time the enclosed block (or decorated function) as one stage of posting
+    
+    Yields a dict; setting its 'status' to 'error' marks a failure that was
+    handled without raising. Exceptions are recorded as errors and re-raised.
+    """
+    span = {'status': 'ok'}
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        span['status'] = 'error'
+        raise
+    finally:
+        try:
+            record_span(stage, platform, time.perf_counter() - start, span['status'], fields)
+        except Exception as e:
+            print(f"⚠️  Failed to record timing for {stage}: {e}")
+
+def write_metrics():
+    """Add this process's timings to the stored histograms and rewrite METRICS_FILE"""
+    if not METRICS_FILE:
+        return
+    with _metrics_lock:
+        pending = dict(_pending_metrics)
+        _pending_metrics.clear()
+    if not pending:
+        return
+    
     try:
-        with open(TOPOST_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(METRICS_STATE_FILE, timeout=30)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS histograms ("
+                    " stage TEXT, platform TEXT, status TEXT, count INTEGER, total REAL, buckets TEXT,"
+                    " PRIMARY KEY (stage, platform, status))"
+                )
+                for key, (count, total, buckets) in pending.items():
+                    row = conn.execute(
+                        "SELECT count, total, buckets FROM histograms WHERE stage = ? AND platform = ? AND status = ?", key
+                    ).fetchone()
+                    if row:
+                        count += row[0]
+                        total += row[1]
+                        buckets = [a + b for a, b in zip(buckets, json.loads(row[2]))]
+                    conn.execute("INSERT OR REPLACE INTO histograms VALUES (?, ?, ?, ?, ?, ?)",
+                                 (*key, count, total, json.dumps(buckets)))
+                rows = conn.execute("SELECT * FROM histograms ORDER BY stage, platform, status").fetchall()
+        finally:
+            conn.close()
         
-        if not lines:
-            print("No content to post - topost.txt is empty")
-            return None, []
+        lines = [
+            "# HELP poster_stage_duration_seconds Time spent in each stage of posting",
+            "# TYPE poster_stage_duration_seconds histogram",
+        ]
+        for stage, platform, status, count, total, buckets in rows:
+            labels = f'stage="{stage}",platform="{platform}",status="{status}"'
+            for bound, bucket_count in zip(METRICS_BUCKETS, json.loads(buckets)):
+                lines.append(f'poster_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'poster_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'poster_stage_duration_seconds_sum{{{labels}}} {total}')
+            lines.append(f'poster_stage_duration_seconds_count{{{labels}}} {count}')
         
-        first_line = lines[0].strip()
-        remaining_lines = lines[1:]
+        atomic_write(METRICS_FILE, ('\n'.join(lines) + '\n').encode('utf-8'))
+        os.chmod(METRICS_FILE, 0o644)  # Readable by the metrics collector
+    
+    except Exception as e:
+        print(f"⚠️  Failed to write metrics to {METRICS_FILE}: {e}")
+
+def line_digest(raw):
+    """Return a short fingerprint of a raw queue line's content"""
+    return hashlib.sha256(raw.strip()).hexdigest()[:16]
+
+def save_cursor(offset, last=None, done=None):
+    """Persist the queue position: the byte offset of the next unposted line in topost.txt,
+    the (start offset, digest) of the posted line that ends there, and the lines after it
+    that were already posted out of order ({start offset: (end offset, digest)})"""
+    last_start, last_digest = last or (None, None)
+    state = {'offset': offset, 'last_start': last_start, 'last_digest': last_digest,
+             'done': {str(start): entry for start, entry in (done or {}).items()}}
+    atomic_write(CURSOR_FILE, json.dumps(state).encode('utf-8'))
+
+def line_at(f, start, end, digest):
+    """Return True if the open queue file holds the line with digest exactly at bytes start..end"""
+    if start is None:
+        return False
+    f.seek(start)
+    raw = f.readline()
+    return f.tell() == end and line_digest(raw) == digest
+
+def find_line(f, digest, near):
+    """Return (start, end) of the line with digest in the open queue file that ends nearest to offset near, or None"""
+    best = None
+    f.seek(0)
+    while True:
+        start = f.tell()
+        raw = f.readline()
+        if not raw:
+            return best
+        if line_digest(raw) == digest and (best is None or abs(f.tell() - near) < abs(best[1] - near)):
+            best = (start, f.tell())
+
+def verify_done(f, offset, done):
+    """Return the out-of-order posted lines of the open queue file that are still where the cursor says
+    
+    A line that moved because the file was edited is found again by its
+    digest; one that can't be found any more is forgotten.
+    """
+    verified = {}
+    moved = []
+    for start, (end, digest) in done.items():
+        if start >= offset and line_at(f, start, end, digest):
+            verified[start] = (end, digest)
+        else:
+            moved.append(digest)
+    
+    if moved:
+        f.seek(offset)
+        while moved:
+            start = f.tell()
+            raw = f.readline()
+            if not raw:
+                break
+            digest = line_digest(raw)
+            if start not in verified and digest in moved:
+                moved.remove(digest)
+                verified[start] = (f.tell(), digest)
+        if moved:
+            print(f"⚠️  {len(moved)} line(s) posted out of order are no longer in {TOPOST_FILE}")
+    
+    return verified
+
+def load_cursor():
+    """Return the queue position as a dict with 'offset', 'last' and 'done'
+    
+    The cursor remembers where the last consumed line was and a digest of it,
+    so that an edited or replaced queue file is detected: the cursor then
+    resumes after that line if it is still present (the occurrence nearest
+    its old place, should it appear more than once), or starts from the
+    beginning of the new file. Lines posted out of order are checked against
+    the file the same way.
+    """
+    try:
+        with open(CURSOR_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {'offset': 0, 'last': None, 'done': {}}
+    
+    offset = state.get('offset', 0)
+    last_start = state.get('last_start')
+    last_digest = state.get('last_digest')
+    if last_digest is None and state.get('last_line'):
+        # Saved before positions were recorded: the line is found again by its text
+        last_digest = line_digest(state['last_line'].encode('utf-8'))
+    # Entries saved without a digest can't be checked and are dropped; duplicate detection stops a repost
+    done = {int(start): tuple(entry) for start, entry in state.get('done', {}).items() if isinstance(entry, list)}
+    
+    try:
+        f = open(TOPOST_FILE, 'rb')
+    except FileNotFoundError:
+        return {'offset': offset, 'last': (last_start, last_digest) if last_digest else None, 'done': done}
+    
+    with f:
+        if offset and last_digest and not line_at(f, last_start, offset, last_digest):
+            # The queue changed underneath the cursor; look for the last consumed line
+            found = find_line(f, last_digest, offset)
+            if found:
+                print(f"⚠️  {TOPOST_FILE} changed since the last run, resuming after the last posted line")
+                last_start, offset = found
+            else:
+                print(f"⚠️  {TOPOST_FILE} was replaced since the last run, starting from its first line")
+                offset, last_digest = 0, None
         
-        return first_line, remaining_lines
+        done = verify_done(f, offset, done)
+    
+    return {'offset': offset, 'last': (last_start, last_digest) if last_digest else None, 'done': done}
+
+def iter_pending(f, cursor):
+    """Yield (start, end, line) for every unposted, non-blank line of the open queue file"""
+    f.seek(cursor['offset'])
+    while True:
+        start = f.tell()
+        raw = f.readline()
+        if not raw:
+            return
+        if start in cursor['done']:
+            continue
+        line = raw.decode('utf-8').strip()
+        if line:
+            yield start, f.tell(), line
+
+def split_schedule(line, now=None):
+    """Split an optional '@when' prefix off a queue line, returning (due timestamp or None, rest)
+    
+    '@2026-05-01T09:30' (or '@2026-05-01 09:30') holds the line until that
+    local time; '@09:30' holds it until 09:30 on the day it comes up.
+    """
+    match = SCHEDULE_PATTERN.match(line)
+    if not match:
+        return None, line
+    
+    when, rest = match.groups()
+    try:
+        if len(when) == 5:
+            today = datetime.fromtimestamp(now if now is not None else time.time())
+            slot = datetime.strptime(when, '%H:%M')
+            due = today.replace(hour=slot.hour, minute=slot.minute, second=0, microsecond=0)
+        else:
+            due = datetime.fromisoformat(when.replace(' ', 'T'))
+    except ValueError:
+        return None, line
     
+    return due.timestamp(), rest
+
+def read_first_line():
+    """Read the next due unposted line from topost.txt, returning (line, position)
+    
+    Normally this is the line at the saved cursor. Lines scheduled for later
+    are skipped over; committing a line with update_files() just records its
+    position (start, end byte offsets).
+    """
+    with timed('queue_read') as span:
+        try:
+            cursor = load_cursor()
+            now = time.time()
+            waiting = 0
+            with open(TOPOST_FILE, 'rb') as f:
+                for start, end, line in iter_pending(f, cursor):
+                    due, _ = split_schedule(line, now)
+                    if due is None or due <= now:
+                        return line, (start, end)
+                    waiting += 1
+            
+            if waiting:
+                print(f"No content due yet - {waiting} scheduled item(s) waiting")
+            else:
+                print("No content to post - topost.txt is empty")
+            return None, None
+        
+        except FileNotFoundError:
+            print(f"Error: {TOPOST_FILE} not found")
+            span['status'] = 'error'
+            return None, None
+        except Exception as e:
+            print(f"Error reading {TOPOST_FILE}: {e}")
+            span['status'] = 'error'
+            return None, None
+
+def peek_queue(count):
+    """Return up to count upcoming unposted lines from topost.txt without consuming them"""
+    lines = []
+    try:
+        with open(TOPOST_FILE, 'rb') as f:
+            for _, _, line in iter_pending(f, load_cursor()):
+                lines.append(line)
+                if len(lines) >= count:
+                    break
     except FileNotFoundError:
         print(f"Error: {TOPOST_FILE} not found")
-        return None, []
+    
+    return lines
+
+def commit_position(position):
+    """Mark the queue line at position as posted and advance the cursor as far as possible"""
+    cursor = load_cursor()
+    offset, last, done = cursor['offset'], cursor['last'], cursor['done']
+    start, end = position
+    
+    # Move the cursor over every consecutive posted (or blank) line
+    with open(TOPOST_FILE, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(start)
+        done[start] = (end, line_digest(f.readline()))
+        f.seek(offset)
+        while True:
+            line_start = f.tell()
+            raw = f.readline()
+            if not raw:
+                break
+            if line_start in done:
+                offset, digest = done.pop(line_start)
+                last = (line_start, digest)
+            elif raw.strip():
+                break
+    
+    if offset >= size and not done:
+        # Queue fully drained: empty the file so it doesn't grow forever,
+        # unless a line was appended since it was read (the cursor then
+        # simply stops before it). Truncating before resetting the cursor
+        # means a crash in between can never replay already posted lines.
+        with open(TOPOST_FILE, 'r+b') as f:
+            if os.fstat(f.fileno()).st_size == size:
+                f.truncate(0)
+                os.fsync(f.fileno())
+                save_cursor(0)
+                return
+    
+    save_cursor(offset, last, done)
+
+def compact_queue():
+    """Rewrite topost.txt without the lines that were already posted"""
+    try:
+        cursor = load_cursor()
+        with open(TOPOST_FILE, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            remaining = b''.join(
+                line.encode('utf-8') + b'\n' for _, _, line in iter_pending(f, cursor)
+            )
+        
+        atomic_write(TOPOST_FILE, remaining)
+        save_cursor(0)
+        print(f"✓ Compacted {TOPOST_FILE}: dropped {size - len(remaining)} bytes of posted lines")
+    
     except Exception as e:
-        print(f"Error reading {TOPOST_FILE}: {e}")
-        return None, []
+        print(f"Error compacting {TOPOST_FILE}: {e}")
+        return False
+    
+    return True
+
+class ScheduleIndex:
+    """Time-ordered heap of pending queue items for daemon mode
+    
+    The queue file is scanned once; afterwards only newly appended lines are
+    read. Unscheduled lines are due as soon as they are seen, so they keep
+    their queue order among themselves.
+    """
+    
+    def __init__(self):
+        self.heap = []  # (due, start, end, line)
+        self.scanned = None  # Byte offset up to which topost.txt has been indexed
+        self.file_id = None
+        self.cursor_offset = 0
+    
+    def refresh(self):
+        """Index lines appended since the last refresh, rebuilding if the file was rewritten"""
+        try:
+            stat = os.stat(TOPOST_FILE)
+        except FileNotFoundError:
+            self.reset()
+            return
+        
+        cursor = load_cursor()
+        file_id = (stat.st_dev, stat.st_ino)
+        rebuild = (self.scanned is None or file_id != self.file_id or stat.st_size < self.scanned
+                   or cursor['offset'] < self.cursor_offset)
+        self.cursor_offset = cursor['offset']
+        if rebuild:
+            self.heap, self.scanned, self.file_id = [], cursor['offset'], file_id
+        if stat.st_size == self.scanned:
+            return
+        
+        now = time.time()
+        with open(TOPOST_FILE, 'rb') as f:
+            f.seek(self.scanned)
+            while True:
+                start = f.tell()
+                raw = f.readline()
+                if not raw.endswith(b'\n'):
+                    break  # Wait until the line being appended is complete
+                self.scanned = f.tell()
+                line = raw.decode('utf-8', errors='replace').strip()
+                if line and start not in cursor['done']:
+                    due, _ = split_schedule(line, now)
+                    heapq.heappush(self.heap, (now if due is None else due, start, self.scanned, line))
+    
+    def pop_due(self, now):
+        """Remove and return the earliest item due by now that is still unposted, or None"""
+        cursor = None
+        while self.heap and self.heap[0][0] <= now:
+            item = heapq.heappop(self.heap)
+            cursor = cursor or load_cursor()
+            start = item[1]
+            # Another run (e.g. a cron job) may have posted it meanwhile
+            if start >= cursor['offset'] and start not in cursor['done']:
+                return item
+        return None
+    
+    def reset(self):
+        """Forget the index so the next refresh rescans topost.txt"""
+        self.heap, self.scanned = [], None
+    
+    def push(self, due, start, end, line):
+        """Put an item (back) into the index"""
+        heapq.heappush(self.heap, (due, start, end, line))
+    
+    def next_due(self):
+        """Return when the earliest pending item is due, or None if nothing is pending"""
+        return self.heap[0][0] if self.heap else None
 
-def create_bluesky_post_with_embed(client, url, comment, metadata):
-    """Create a Bluesky post with embedded link card"""
+def create_bluesky_post_with_embed(client, url, comment, metadata, image_data=None):
+    """Create a Bluesky post with embedded link card
+    
+    image_data is the already processed featured image shared with the other
+    platforms, so the link card thumbnail is never downloaded twice.
+    """
+    from atproto import models
+    
     try:
         # Create external embed
         external_embed = models.AppBskyEmbedExternal.External(
@@ -71,54 +615,31 @@ def create_bluesky_post_with_embed(client, url, comment, metadata):
             description=metadata['description'][:1000] if metadata['description'] else ''
         )
         
-        # Handle image if available
-        if metadata['image_url']:
-            print(f"Downloading featured image: {metadata['image_url']}")
-            image_data = download_and_process_image(metadata['image_url'])
-            
-            if image_data:
-                print("Uploading image to Bluesky...")
-                blob = upload_image_to_bluesky(client, image_data)
-                if blob:
-                    external_embed.thumb = blob.blob
-                    print("✓ Image uploaded successfully")
-                else:
-                    print("⚠️  Failed to upload image, posting without it")
+        # Attach the featured image if one was prepared
+        if image_data:
+            print("Uploading image to Bluesky...")
+            blob = upload_image_to_bluesky(client, image_data)
+            if blob:
+                external_embed.thumb = blob.blob
+                print("✓ Image uploaded successfully")
             else:
-                print("⚠️  Failed to download image, posting without it")
+                print("⚠️  Failed to upload image, posting without it")
         
         # Create the embed
         embed = models.AppBskyEmbedExternal.Main(external=external_embed)
         
         # Create the post
-        response = client.send_post(text=comment, embed=embed)
+        response = rate_limited_call(client, client.send_post, text=comment, embed=embed)
         return response
     
     except Exception as e:
         print(f"Error creating post with embed: {e}")
         return None
-        with open(TOPOST_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        if not lines:
-            print("No content to post - topost.txt is empty")
-            return None, []
-        
-        first_line = lines[0].strip()
-        remaining_lines = lines[1:]
-        
-        return first_line, remaining_lines
-    
-    except FileNotFoundError:
-        print(f"Error: {TOPOST_FILE} not found")
-        return None, []
-    except Exception as e:
-        print(f"Error reading {TOPOST_FILE}: {e}")
-        return None, []
-    pass
 
 def parse_line(line):
     """Parse a line into URL/image and comment, or just text for simple status"""
+    _, line = split_schedule(line)
+    
     if '|' not in line:
         # No separator found - treat entire line as simple text status
         return {'type': 'text', 'content': line.strip()}
@@ -131,283 +652,802 @@ def parse_line(line):
     if first_part.startswith(('http://', 'https://', 'www.')):
         return {'type': 'url', 'url': first_part, 'comment': comment}
     
-    # Check if the first part is an image file
+    # Check if the first part is one or more comma-separated image files
     image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff')
-    if any(first_part.lower().endswith(ext) for ext in image_extensions):
-        return {'type': 'image', 'filename': first_part, 'caption': comment}
+    filenames = [name.strip() for name in first_part.split(',')]
+    if all(name.lower().endswith(image_extensions) for name in filenames):
+        return {'type': 'image', 'filenames': filenames, 'caption': comment}
     
     # First part doesn't look like a URL or image, treat whole line as text
     return {'type': 'text', 'content': line.strip()}
 
-def fetch_page_metadata(url):
-    """Fetch page title, description, and featured image from URL"""
-    try:
-        headers = {'User-Agent': USER_AGENT}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Get title
-        title = None
-        title_tag = soup.find('title')
-        if title_tag:
-            title = title_tag.get_text().strip()
-        
-        # Try Open Graph title first
-        og_title = soup.find('meta', property='og:title')
-        if og_title and og_title.get('content'):
-            title = og_title.get('content').strip()
-        
-        # Get description
-        description = None
-        # Try Open Graph description first
-        og_desc = soup.find('meta', property='og:description')
-        if og_desc and og_desc.get('content'):
-            description = og_desc.get('content').strip()
-        else:
-            # Try meta description
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc and meta_desc.get('content'):
-                description = meta_desc.get('content').strip()
-        
-        # Get featured image URL
-        image_url = None
-        # Try Open Graph image first
-        og_image = soup.find('meta', property='og:image')
-        if og_image and og_image.get('content'):
-            image_url = og_image.get('content').strip()
-            # Make sure it's an absolute URL
-            image_url = urljoin(url, image_url)
-        
-        # If no OG image, try Twitter card image
-        if not image_url:
-            twitter_image = soup.find('meta', attrs={'name': 'twitter:image'})
-            if twitter_image and twitter_image.get('content'):
-                image_url = twitter_image.get('content').strip()
-                image_url = urljoin(url, image_url)
-        
-        return {
-            'title': title or url,
-            'description': description or '',
-            'image_url': image_url
-        }
+_http_session = None
+_http_lock = threading.Lock()
+_host_slots = {}  # host -> semaphore limiting concurrent requests to it
+
+def get_http_session():
+    """Return the shared keep-alive session used for all web scraping"""
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            
+            class CappedRetry(Retry):
+                """Retry policy that honors Retry-After but never sleeps longer than HTTP_MAX_RETRY_AFTER"""
+                
+                def get_retry_after(self, response):
+                    retry_after = super().get_retry_after(response)
+                    if retry_after is None:
+                        return None
+                    return min(retry_after, HTTP_MAX_RETRY_AFTER)
+            
+            retry = CappedRetry(
+                total=HTTP_MAX_RETRIES,
+                backoff_factor=HTTP_BACKOFF_FACTOR,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=('GET', 'HEAD'),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_maxsize=HTTP_PER_HOST_LIMIT, max_retries=retry)
+            session = requests.Session()
+            session.headers['User-Agent'] = USER_AGENT
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_session = session
+    return _http_session
+
+@contextmanager
+def http_get(url, **kwargs):
+    """GET url through the shared session while holding one of its host's slots
+    
+    Retries with exponential backoff on 429/5xx are handled by the session.
+    The response is released with release_response() on exit.
+    """
+    host = urlparse(url).netloc.lower()
+    with _http_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(HTTP_PER_HOST_LIMIT)
     
+    with slot:
+        response = get_http_session().get(url, **kwargs)
+        try:
+            yield response
+        finally:
+            release_response(response)
+
+def release_response(response):
+    """Close a response, returning its connection to the pool when the body was (nearly) read
+    
+    A streamed response closed with unread body forces the connection to be
+    dropped, so up to HTTP_DRAIN_MAX_BYTES of a known-length remainder are
+    read and discarded first.
+    """
+    try:
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) - response.raw.tell() <= HTTP_DRAIN_MAX_BYTES:
+            response.raw.drain_conn()
+    except Exception:
+        pass  # The connection is dropped instead
+    response.close()
+
+@contextmanager
+def metadata_cache():
+    """Open the on-disk page metadata and remote image cache, creating it on first use"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(METADATA_CACHE_FILE, timeout=30)
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_metadata ("
+            " url TEXT PRIMARY KEY, title TEXT, description TEXT, image_url TEXT,"
+            " etag TEXT, last_modified TEXT, fetched_at REAL, accessed_at REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_sources ("
+            " url TEXT PRIMARY KEY, digest TEXT, fetched_at REAL)"
+        )
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def get_cached_metadata(url):
+    """Return the cached metadata row for url as a dict, or None"""
+    try:
+        with metadata_cache() as conn:
+            row = conn.execute(
+                "SELECT title, description, image_url, etag, last_modified, fetched_at"
+                " FROM page_metadata WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE page_metadata SET accessed_at = ? WHERE url = ?", (time.time(), url))
     except Exception as e:
-        print(f"Error fetching metadata for {url}: {e}")
-        return {
-            'title': url,
-            'description': '',
-            'image_url': None
-        }
+        print(f"⚠️  Metadata cache unavailable: {e}")
+        return None
+    
+    title, description, image_url, etag, last_modified, fetched_at = row
+    return {
+        'metadata': {'title': title, 'description': description, 'image_url': image_url},
+        'etag': etag,
+        'last_modified': last_modified,
+        'fetched_at': fetched_at,
+    }
 
-def load_local_image(filename):
-    """Load and process a local image file from the images subfolder"""
+def store_cached_metadata(url, metadata, etag=None, last_modified=None):
+    """Save freshly fetched metadata, evicting the least recently used entries"""
+    now = time.time()
     try:
-        image_path = os.path.join('images', filename)
-        
-        if not os.path.exists(image_path):
-            print(f"Error: Image file not found: {image_path}")
-            return None
-        
-        with open(image_path, 'rb') as f:
-            image_data = f.read()
-        
-        # Process the image with PIL (resize if needed, convert format, etc.)
-        img = Image.open(BytesIO(image_data))
+        with metadata_cache() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO page_metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, metadata['title'], metadata['description'], metadata['image_url'],
+                 etag, last_modified, now, now)
+            )
+            conn.execute(
+                "DELETE FROM page_metadata WHERE url NOT IN"
+                " (SELECT url FROM page_metadata ORDER BY accessed_at DESC LIMIT ?)",
+                (METADATA_CACHE_MAX_ENTRIES,)
+            )
+    except Exception as e:
+        print(f"⚠️  Failed to cache metadata for {url}: {e}")
+
+class HeadMetadataParser(HTMLParser):
+    """Incrementally collect <title> and <meta> tags, stopping at the end of <head>"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.meta = {}  # (attribute, value) -> content of the first matching <meta>
+        self.done = False
+        self._title_parts = None
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self.done = True
+        elif tag == 'title' and self.title is None:
+            self._title_parts = []
+        elif tag == 'meta':
+            attrs = dict(attrs)
+            for key in ('property', 'name'):
+                if attrs.get(key):
+                    self.meta.setdefault((key, attrs[key]), attrs.get('content'))
+    
+    def handle_endtag(self, tag):
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts)
+            self._title_parts = None
+        elif tag == 'head':
+            self.done = True
+    
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+def response_encoding(response, first_chunk):
+    """Pick the text encoding from the Content-Type header or an early <meta charset>"""
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        return response.encoding
+    match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', first_chunk[:2048], re.IGNORECASE)
+    if match:
+        return match.group(1).decode('ascii')
+    return 'utf-8'
+
+def read_head_metadata(response, url):
+    """Stream an HTML response until </head> and extract title, description, and featured image URL
+    
+    The download stops as soon as the head has been parsed, or after
+    METADATA_MAX_BYTES, so large article bodies are never fetched.
+    """
+    parser = HeadMetadataParser()
+    decoder = None
+    received = 0
+    
+    for chunk in response.iter_content(chunk_size=16384):
+        if decoder is None:
+            try:
+                decoder = codecs.getincrementaldecoder(response_encoding(response, chunk))(errors='replace')
+            except LookupError:
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        received += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or received >= METADATA_MAX_BYTES:
+            break
+    
+    release_response(response)
+    
+    # Get title, preferring Open Graph
+    title = parser.title.strip() if parser.title else None
+    og_title = parser.meta.get(('property', 'og:title'))
+    if og_title:
+        title = og_title.strip()
+    
+    # Get description, preferring Open Graph over the meta description
+    description = None
+    og_desc = parser.meta.get(('property', 'og:description'))
+    meta_desc = parser.meta.get(('name', 'description'))
+    if og_desc:
+        description = og_desc.strip()
+    elif meta_desc:
+        description = meta_desc.strip()
+    
+    # Get featured image URL: Open Graph first, then Twitter card
+    image_url = None
+    og_image = parser.meta.get(('property', 'og:image'))
+    twitter_image = parser.meta.get(('name', 'twitter:image'))
+    if og_image:
+        # Make sure it's an absolute URL
+        image_url = urljoin(url, og_image.strip())
+    elif twitter_image:
+        image_url = urljoin(url, twitter_image.strip())
+    
+    return {
+        'title': title or url,
+        'description': description or '',
+        'image_url': image_url
+    }
+
+def fetch_page_metadata(url):
+    """Fetch page title, description, and featured image from URL
+    
+    Results are cached on disk for METADATA_CACHE_TTL seconds. Expired
+    entries are revalidated with a conditional GET (ETag / Last-Modified),
+    and are reused as-is if the site cannot be reached.
+    """
+    with timed('metadata') as span:
+        cached = get_cached_metadata(url)
+        if cached and time.time() - cached['fetched_at'] < METADATA_CACHE_TTL:
+            print("✓ Using cached page metadata")
+            return cached['metadata']
         
-        # Convert to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
+        try:
+            headers = {}
+            if cached and cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached and cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+            
+            with http_get(url, headers=headers, timeout=10, stream=True) as response:
+                if response.status_code == 304 and cached:
+                    print("✓ Page not modified, using cached metadata")
+                    store_cached_metadata(url, cached['metadata'], cached['etag'], cached['last_modified'])
+                    return cached['metadata']
+                
+                response.raise_for_status()
+                
+                metadata = read_head_metadata(response, url)
+                store_cached_metadata(url, metadata, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                return metadata
         
+        except Exception as e:
+            print(f"Error fetching metadata for {url}: {e}")
+            span['status'] = 'error'
+            if cached:
+                print("⚠️  Using stale cached metadata")
+                return cached['metadata']
+            return {
+                'title': url,
+                'description': '',
+                'image_url': None
+            }
+
+def save_image(img, image_format, **params):
+    """Encode a PIL image in image_format and return the bytes"""
+    img_bytes = BytesIO()
+    img.save(img_bytes, format=image_format, **params)
+    return img_bytes.getvalue()
+
+def fit_quality(img, image_format, max_bytes):
+    """Encode img as JPEG or WebP at the highest quality that fits max_bytes, or return None"""
+    # Most images fit at full quality, so that is tried before searching
+    data = save_image(img, image_format, quality=IMAGE_MAX_QUALITY, optimize=True)
+    if len(data) <= max_bytes:
+        return data
+    
+    best = None
+    low, high = IMAGE_MIN_QUALITY, IMAGE_MAX_QUALITY - 1
+    while low <= high:
+        quality = (low + high) // 2
+        data = save_image(img, image_format, quality=quality, optimize=True)
+        if len(data) <= max_bytes:
+            best, low = data, quality + 1
+        else:
+            high = quality - 1
+    
+    return best
+
+def encode_image(image_data, constraints):
+    """Decode, resize and encode raw image bytes to fit one platform's upload constraints
+    
+    Animated GIFs are kept as they are and transparent images stay PNG (or
+    WebP) where the platform allows it. Everything else becomes JPEG at the
+    highest quality within max_bytes, or WebP if that fits where JPEG doesn't.
+    """
+    from PIL import Image, ImageOps
+    
+    max_bytes = constraints['max_bytes']
+    max_size = constraints['max_size']
+    formats = constraints['formats']
+    
+    img = Image.open(BytesIO(image_data))
+    if getattr(img, 'is_animated', False) and img.format == 'GIF' and 'GIF' in formats and len(image_data) <= max_bytes:
+        return image_data
+    
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+    
+    # Scale down before anything else copies the pixels, to the box the image must fit once upright
+    target_size = max_size
+    if img.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+        target_size = (max_size[1], max_size[0])
+    if img.format == 'JPEG':
+        img.draft('RGB', target_size)  # The decoder itself scales by 1/2, 1/4 or 1/8
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        img = img.convert('RGBA' if has_alpha else 'RGB')  # Palette images can't be resampled smoothly
+    if img.size[0] > target_size[0] or img.size[1] > target_size[1]:
+        img.thumbnail(target_size, Image.Resampling.LANCZOS)  # Image.reduce()s by a whole factor first
+    
+    # Re-encoding drops EXIF data, so apply its rotation to the pixels
+    img = ImageOps.exif_transpose(img)
+    
+    if has_alpha and 'PNG' not in formats and 'WEBP' not in formats:
+        background = Image.new('RGB', img.size, 'white')
+        background.paste(img.convert('RGBA'), mask=img.convert('RGBA'))
+        img, has_alpha = background, False
+    mode = 'RGBA' if has_alpha else 'RGB'
+    if img.mode != mode:
+        img = img.convert(mode)
+    
+    for _ in range(IMAGE_MAX_SHRINKS + 1):
         # Resize if too large (both platforms have size limits)
-        max_size = (1200, 1200)
         if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
             img.thumbnail(max_size, Image.Resampling.LANCZOS)
         
-        # Save to bytes as JPEG
-        img_bytes = BytesIO()
-        img.save(img_bytes, format='JPEG', quality=85)
-        img_bytes.seek(0)
+        if has_alpha:
+            candidates = [fmt for fmt in ('PNG', 'WEBP') if fmt in formats]
+        else:
+            candidates = [fmt for fmt in ('JPEG', 'WEBP') if fmt in formats]
+        
+        for image_format in candidates:
+            if image_format == 'PNG':
+                data = save_image(img, 'PNG')
+                if len(data) <= max_bytes:
+                    return data
+            else:
+                data = fit_quality(img, image_format, max_bytes)
+                if data:
+                    return data
         
-        return img_bytes.getvalue()
+        max_size = (img.size[0] * 3 // 4, img.size[1] * 3 // 4)
     
-    except Exception as e:
-        print(f"Error loading local image {filename}: {e}")
+    raise ValueError(f"image does not fit in {max_bytes} bytes")
+
+def image_mime_type(image_data):
+    """Return the MIME type of encoded image bytes"""
+    if image_data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if image_data.startswith(b'GIF8'):
+        return 'image/gif'
+    if image_data[:4] == b'RIFF' and image_data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+def image_cache_path(digest, platform):
+    """Return the cache file for a platform's encoding of the source image with the given sha256 digest"""
+    key = hashlib.sha256(digest.encode('ascii'))
+    key.update(f"|{platform}|{json.dumps(IMAGE_CONSTRAINTS[platform], sort_keys=True)}"
+               f"|q{IMAGE_MIN_QUALITY}-{IMAGE_MAX_QUALITY}|s{IMAGE_MAX_SHRINKS}".encode('utf-8'))
+    return os.path.join(IMAGE_CACHE_DIR, key.hexdigest() + '.img')
+
+def evict_image_cache():
+    """Delete least recently used cached images until the cache fits IMAGE_CACHE_MAX_BYTES"""
+    entries = []
+    total_size = 0
+    with os.scandir(IMAGE_CACHE_DIR) as it:
+        for entry in it:
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+    
+    for _, size, path in sorted(entries):
+        if total_size <= IMAGE_CACHE_MAX_BYTES:
+            break
+        try:
+            os.unlink(path)
+            total_size -= size
+        except FileNotFoundError:
+            pass
+
+def read_cached_image(digest, platform):
+    """Return the cached encoding of a source image for platform, or None"""
+    cache_path = image_cache_path(digest, platform)
+    try:
+        with open(cache_path, 'rb') as f:
+            processed = f.read()
+        os.utime(cache_path)  # Mark as recently used for LRU eviction
+        return processed
+    except FileNotFoundError:
         return None
-    """Download image and process it for social media upload"""
+
+def store_cached_image(digest, platform, processed):
+    """Store a platform's encoding of a source image in the on-disk cache"""
+    cache_path = image_cache_path(digest, platform)
     try:
-        headers = {'User-Agent': USER_AGENT}
-        response = requests.get(image_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        # Open image with PIL
-        img = Image.open(BytesIO(response.content))
-        
-        # Convert to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(processed)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️  Failed to cache processed image: {e}")
+
+_image_pool = None
+_image_pool_lock = threading.Lock()
+
+def get_image_pool():
+    """Return the shared process pool used to encode images, starting it on first use
+    
+    Workers are spawned rather than forked, since the pool may be started
+    while other threads (prefetch, platform uploads) hold locks.
+    """
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            import multiprocessing
+            _image_pool = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        return _image_pool
+
+def can_reuse_encoding(encoded, source_constraints, constraints):
+    """Return True if an image encoded under source_constraints is exactly what constraints would produce
+    
+    encode_image() returns the first candidate that fits, so an encoding made
+    under a looser byte limit (with the same dimensions and at least the same
+    formats) is also the result for a stricter limit it happens to fit.
+    """
+    return (source_constraints['max_size'] == constraints['max_size']
+            and source_constraints['max_bytes'] >= constraints['max_bytes']
+            and set(constraints['formats']) <= set(source_constraints['formats'])
+            and len(encoded) <= constraints['max_bytes']
+            and image_mime_type(encoded).split('/')[1].upper() in constraints['formats'])
+
+@timed('image_processing')
+def process_images(images, platforms):
+    """Return upload-ready encodings of each raw image as {platform: bytes}, in order
+    
+    Encodings missing from the on-disk cache are made in parallel worker
+    processes when there is more than one of them. Platforms are handled from
+    the loosest byte limit down, so stricter ones can usually reuse its result.
+    """
+    digests = [hashlib.sha256(image_data).hexdigest() for image_data in images]
+    processed = [{} for _ in images]
+    for i, digest in enumerate(digests):
+        for platform in platforms:
+            cached = read_cached_image(digest, platform)
+            if cached is not None:
+                processed[i][platform] = cached
+    
+    stored = False
+    for platform in sorted(platforms, key=lambda name: IMAGE_CONSTRAINTS[name]['max_bytes'], reverse=True):
+        constraints = IMAGE_CONSTRAINTS[platform]
+        missing = []
+        for i, variants in enumerate(processed):
+            if platform in variants:
+                continue
+            reusable = [encoded for other, encoded in variants.items()
+                        if can_reuse_encoding(encoded, IMAGE_CONSTRAINTS[other], constraints)]
+            if reusable:
+                variants[platform] = reusable[0]
+                store_cached_image(digests[i], platform, reusable[0])
+                stored = True
+            else:
+                missing.append(i)
         
-        # Resize if too large (both platforms have size limits)
-        max_size = (1200, 1200)
-        if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        if len(missing) > 1 and IMAGE_PROCESS_WORKERS > 1:
+            encoded = list(get_image_pool().map(encode_image, [images[i] for i in missing],
+                                                [constraints] * len(missing)))
+        else:
+            encoded = [encode_image(images[i], constraints) for i in missing]
         
-        # Save to bytes
-        img_bytes = BytesIO()
-        img.save(img_bytes, format='JPEG', quality=85)
-        img_bytes.seek(0)
+        for i, result in zip(missing, encoded):
+            store_cached_image(digests[i], platform, result)
+            processed[i][platform] = result
+            stored = True
+    
+    if stored:
+        evict_image_cache()
+    
+    return processed
+
+def fits_unchanged(img, file_size, platforms):
+    """Return True if an opened image file can be uploaded as it is to every platform
+    
+    Only header information is used (format, mode, dimensions, EXIF tags),
+    so the pixel data is never decoded.
+    """
+    exif = img.getexif()
+    if exif.get(EXIF_ORIENTATION, 1) != 1 or EXIF_GPS_INFO in exif:
+        return False  # Needs rotating, or would publish where the photo was taken
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+        return False
+    if getattr(img, 'is_animated', False) and img.format != 'GIF':
+        return False  # Only GIFs are kept animated (where allowed); other formats are posted as their first frame
+    
+    for platform in platforms:
+        constraints = IMAGE_CONSTRAINTS[platform]
+        if (img.format not in constraints['formats'] or file_size > constraints['max_bytes']
+                or img.size[0] > constraints['max_size'][0] or img.size[1] > constraints['max_size'][1]):
+            return False
+    
+    return True
+
+def read_local_image(image_path, platforms):
+    """Read an image file, returning (bytes, True if it can be uploaded unchanged to every platform)"""
+    from PIL import Image
+    
+    with open(image_path, 'rb') as f:
+        with Image.open(f) as img:  # Parses the header only
+            unchanged = fits_unchanged(img, os.fstat(f.fileno()).st_size, platforms)
+        f.seek(0)
+        return f.read(), unchanged
+
+def load_local_images(filenames, platforms):
+    """Load and process local image files from the images subfolder, returning their encodings in order
+    
+    Files that already meet every platform's limits are used as they are,
+    skipping the decode, resize and re-encode.
+    """
+    try:
+        images = []
+        for filename in filenames:
+            image_path = os.path.join('images', filename)
+            
+            if not os.path.exists(image_path):
+                print(f"Error: Image file not found: {image_path}")
+                return None
+            
+            images.append(read_local_image(image_path, platforms))
         
-        return img_bytes.getvalue()
+        to_process = [image_data for image_data, unchanged in images if not unchanged]
+        processed = iter(process_images(to_process, platforms) if to_process else [])
+        return [{platform: image_data for platform in platforms} if unchanged else next(processed)
+                for image_data, unchanged in images]
     
     except Exception as e:
-        print(f"Error downloading/processing image {image_url}: {e}")
+        print(f"Error loading local images {', '.join(filenames)}: {e}")
         return None
 
-def download_and_process_image(image_url):
-    """Download image and process it for Bluesky upload"""
+# Processed remote images for the item being posted, keyed by (URL, platform),
+# so an image is downloaded and encoded once however many targets use it.
+# Cleared after each item; reuse across items comes from the on-disk cache.
+_media_cache = {}
+_media_cache_lock = threading.Lock()
+
+def clear_media_cache():
+    """Forget the processed remote images held in memory for the last item"""
+    with _media_cache_lock:
+        _media_cache.clear()
+
+def get_prefetched_image(image_url, platforms):
+    """Return the encodings of a remote image downloaded by an earlier run as {platform: bytes}, or None"""
     try:
-        headers = {'User-Agent': USER_AGENT}
-        response = requests.get(image_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        # Open image with PIL
-        img = Image.open(BytesIO(response.content))
-        
-        # Convert to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        
-        # Resize if too large (Bluesky has size limits)
-        max_size = (1200, 1200)
-        if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Save to bytes
-        img_bytes = BytesIO()
-        img.save(img_bytes, format='JPEG', quality=85)
-        img_bytes.seek(0)
-        
-        return img_bytes.getvalue()
+        with metadata_cache() as conn:
+            row = conn.execute(
+                "SELECT digest, fetched_at FROM image_sources WHERE url = ?", (image_url,)
+            ).fetchone()
+    except Exception:
+        return None
     
-    except Exception as e:
-        print(f"Error downloading/processing image {image_url}: {e}")
+    if row is None or time.time() - row[1] >= METADATA_CACHE_TTL:
+        return None
+    
+    variants = {platform: read_cached_image(row[0], platform) for platform in platforms}
+    if None in variants.values():
         return None
+    return variants
 
+def read_limited(response, max_bytes):
+    """Read a streamed response body, refusing one larger than max_bytes without downloading the rest"""
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit() and int(length) > max_bytes:
+        raise ValueError(f"response is {int(length)} bytes, over the {max_bytes} byte limit")
+    
+    chunks = []
+    received = 0
+    for chunk in response.iter_content(chunk_size=65536):
+        received += len(chunk)
+        if received > max_bytes:
+            raise ValueError(f"response is over the {max_bytes} byte limit")
+        chunks.append(chunk)
+    
+    return b''.join(chunks)
+
+def remember_remote_image(image_url, content):
+    """Record which source image belongs to image_url, so its cached encodings can be found"""
+    try:
+        with metadata_cache() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO image_sources VALUES (?, ?, ?)",
+                (image_url, hashlib.sha256(content).hexdigest(), time.time())
+            )
+    except Exception as e:
+        print(f"⚠️  Failed to cache image location for {image_url}: {e}")
+
+def download_and_process_image(image_url, platforms):
+    """Download image and process it for upload to each platform, returning {platform: bytes}
+    
+    Each URL is processed once per item, and images already fetched by an
+    earlier run (e.g. the prefetch command) are not downloaded again until
+    METADATA_CACHE_TTL expires.
+    """
+    with _media_cache_lock:
+        variants = {platform: _media_cache[(image_url, platform)]
+                    for platform in platforms if (image_url, platform) in _media_cache}
+    if len(variants) == len(platforms):
+        return variants
+    
+    variants = get_prefetched_image(image_url, platforms)
+    if variants is None:
+        try:
+            with http_get(image_url, timeout=15, stream=True) as response:
+                response.raise_for_status()
+                content = read_limited(response, REMOTE_IMAGE_MAX_BYTES)
+            
+            # Guard against decompression bombs: only the header is read to check the size
+            from PIL import Image
+            with Image.open(BytesIO(content)) as img:
+                if img.width * img.height > IMAGE_MAX_PIXELS:
+                    raise ValueError(f"image is {img.width}x{img.height}, over the {IMAGE_MAX_PIXELS} pixel limit")
+            
+            variants = process_images([content], platforms)[0]
+        
+        except Exception as e:
+            print(f"Error downloading/processing image {image_url}: {e}")
+            return None
+        
+        remember_remote_image(image_url, content)
+    
+    with _media_cache_lock:
+        for platform, image_data in variants.items():
+            _media_cache[(image_url, platform)] = image_data
+    
+    return variants
 
 def upload_image_to_bluesky(client, image_data):
     """Upload image to Bluesky and return blob reference"""
     try:
-        blob = client.upload_blob(image_data)
+        blob = rate_limited_call(client, client.upload_blob, image_data)
         return blob
     except Exception as e:
         print(f"Error uploading image to Bluesky: {e}")
         return None
 
-def create_bluesky_image_post(client, image_data, caption):
-    """Create a Bluesky post with an image"""
+def upload_images(upload, client, images):
+    """Upload every image concurrently with upload(client, image_data), returning the results in order"""
+    if len(images) == 1:
+        return [upload(client, images[0])]
+    
+    with ThreadPoolExecutor(max_workers=len(images)) as executor:
+        return list(executor.map(lambda image_data: upload(client, image_data), images))
+
+def create_bluesky_image_post(client, images, caption):
+    """Create a Bluesky post with up to four images, attached in the given order"""
+    from atproto import models
+    
     try:
-        print("Uploading image to Bluesky...")
-        blob = upload_image_to_bluesky(client, image_data)
+        print(f"Uploading {len(images)} image(s) to Bluesky...")
+        blobs = upload_images(upload_image_to_bluesky, client, images)
         
-        if not blob:
+        if not all(blobs):
             print("Failed to upload image to Bluesky")
             return None
         
         # Create image embed
-        image_embed = models.AppBskyEmbedImages.Image(
-            alt="",  # You could add alt text here if needed
-            image=blob.blob
-        )
+        image_embeds = [
+            models.AppBskyEmbedImages.Image(
+                alt="",  # You could add alt text here if needed
+                image=blob.blob
+            )
+            for blob in blobs
+        ]
         
-        embed = models.AppBskyEmbedImages.Main(images=[image_embed])
+        embed = models.AppBskyEmbedImages.Main(images=image_embeds)
         
         # Create the post
-        response = client.send_post(text=caption, embed=embed)
+        response = rate_limited_call(client, client.send_post, text=caption, embed=embed)
         print("✓ Image uploaded to Bluesky successfully")
         return response
     
     except Exception as e:
         print(f"Error creating Bluesky image post: {e}")
         return None
+
+def create_simple_bluesky_post(client, text):
     """Create a simple text-only Bluesky post"""
     try:
-        response = client.send_post(text=text)
+        response = rate_limited_call(client, client.send_post, text=text)
         return response
     except Exception as e:
         print(f"Error creating simple Bluesky post: {e}")
         return None
 
-def create_simple_bluesky_post(client, text):
-    """Create a simple text-only Bluesky post"""
+def upload_image_to_mastodon(mastodon_client, image_data):
+    """Start an asynchronous Mastodon media upload and return the attachment, whose url stays None while processing"""
     try:
-        response = client.send_post(text=text)
-        return response
+        return rate_limited_call(mastodon_client, mastodon_client.media_post, image_data,
+                                 mime_type=image_mime_type(image_data), synchronous=False)
     except Exception as e:
-        print(f"Error creating simple Bluesky post: {e}")
+        print(f"Error uploading image to Mastodon: {e}")
         return None
 
-def create_mastodon_image_post(mastodon_client, image_data, caption):
-    """Create a Mastodon post with an image"""
+def wait_for_mastodon_media(mastodon_client, attachments):
+    """Poll with backoff until Mastodon has processed every attachment, returning their IDs or None on timeout"""
+    with timed('media_processing', 'mastodon') as span:
+        try:
+            pending = [attachment['id'] for attachment in attachments if not attachment.get('url')]
+            deadline = time.monotonic() + MASTODON_MEDIA_TIMEOUT
+            delay = MASTODON_MEDIA_POLL_INTERVAL
+            
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"Mastodon still processing {len(pending)} attachment(s) after {MASTODON_MEDIA_TIMEOUT}s")
+                    span['status'] = 'error'
+                    return None
+                
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 1.5, MASTODON_MEDIA_MAX_POLL_INTERVAL)
+                pending = [media_id for media_id in pending
+                           if not rate_limited_call(mastodon_client, mastodon_client.media, media_id).get('url')]
+            
+            return [attachment['id'] for attachment in attachments]
+        
+        except Exception as e:
+            print(f"Error checking Mastodon media processing: {e}")
+            span['status'] = 'error'
+            return None
+
+def create_mastodon_image_post(mastodon_client, images, caption, idempotency_key=None):
+    """Create a Mastodon post with up to four images, attached in the given order"""
     try:
-        print("Uploading image to Mastodon...")
-        media_dict = mastodon_client.media_post(image_data, mime_type='image/jpeg')
-        media_id = media_dict['id']
+        print(f"Uploading {len(images)} image(s) to Mastodon...")
+        attachments = upload_images(upload_image_to_mastodon, mastodon_client, images)
         
-        response = mastodon_client.status_post(caption, media_ids=[media_id])
-        print("✓ Image uploaded to Mastodon successfully")
-        return response
-    
-    except Exception as e:
-        print(f"Error creating Mastodon image post: {e}")
-        return None
-    """Create a Bluesky post with embedded link card"""
-    try:
-        # Create external embed
-        external_embed = models.AppBskyEmbedExternal.External(
-            uri=url,
-            title=metadata['title'][:300],  # Bluesky has title limits
-            description=metadata['description'][:1000] if metadata['description'] else ''
-        )
-        
-        # Handle image if available
-        if metadata['image_url']:
-            print(f"Downloading featured image: {metadata['image_url']}")
-            image_data = download_and_process_image(metadata['image_url'])
-            
-            if image_data:
-                print("Uploading image to Bluesky...")
-                blob = upload_image_to_bluesky(client, image_data)
-                if blob:
-                    external_embed.thumb = blob.blob
-                    print("✓ Image uploaded successfully")
-                else:
-                    print("⚠️  Failed to upload image, posting without it")
-            else:
-                print("⚠️  Failed to download image, posting without it")
+        if not all(attachments):
+            print("Failed to upload image to Mastodon")
+            return None
         
-        # Create the embed
-        embed = models.AppBskyEmbedExternal.Main(external=external_embed)
+        # Uploads return as soon as the file is received; the status can only be created once processing is done
+        media_ids = wait_for_mastodon_media(mastodon_client, attachments)
+        if not media_ids:
+            print("Failed to process image on Mastodon")
+            return None
         
-        # Create the post
-        response = client.send_post(text=comment, embed=embed)
+        response = rate_limited_call(mastodon_client, mastodon_client.status_post, caption, media_ids=media_ids,
+                                     idempotency_key=idempotency_key)
+        print("✓ Image uploaded to Mastodon successfully")
         return response
     
     except Exception as e:
-        print(f"Error creating post with embed: {e}")
+        print(f"Error creating Mastodon image post: {e}")
         return None
 
-def create_mastodon_post(mastodon_client, text, url=None, image_data=None):
+def create_mastodon_post(mastodon_client, text, url=None, image_data=None, idempotency_key=None):
     """Create a Mastodon post with optional image and URL"""
     try:
-        media_id = None
+        media_ids = None
         
-        # Upload image if available
+        # Upload image if available, posting without it if the instance can't process it in time
         if image_data:
             print("Uploading image to Mastodon...")
-            media_dict = mastodon_client.media_post(image_data, mime_type='image/jpeg')
-            media_id = media_dict['id']
-            print("✓ Image uploaded to Mastodon successfully")
+            attachment = upload_image_to_mastodon(mastodon_client, image_data)
+            if attachment:
+                media_ids = wait_for_mastodon_media(mastodon_client, [attachment])
+            if media_ids:
+                print("✓ Image uploaded to Mastodon successfully")
         
         # Create post text
         if url:
@@ -416,10 +1456,12 @@ def create_mastodon_post(mastodon_client, text, url=None, image_data=None):
             post_text = text
         
         # Create the toot
-        if media_id:
-            response = mastodon_client.status_post(post_text, media_ids=[media_id])
+        if media_ids:
+            response = rate_limited_call(mastodon_client, mastodon_client.status_post, post_text, media_ids=media_ids,
+                                         idempotency_key=idempotency_key)
         else:
-            response = mastodon_client.status_post(post_text)
+            response = rate_limited_call(mastodon_client, mastodon_client.status_post, post_text,
+                                         idempotency_key=idempotency_key)
         
         return response
     
@@ -427,45 +1469,88 @@ def create_mastodon_post(mastodon_client, text, url=None, image_data=None):
         print(f"Error creating Mastodon post: {e}")
         return None
 
-def create_simple_mastodon_post(mastodon_client, text):
+def create_simple_mastodon_post(mastodon_client, text, idempotency_key=None):
     """Create a simple text-only Mastodon post"""
     try:
-        response = mastodon_client.status_post(text)
+        response = rate_limited_call(mastodon_client, mastodon_client.status_post, text, idempotency_key=idempotency_key)
         return response
     except Exception as e:
         print(f"Error creating simple Mastodon post: {e}")
         return None
 
-def update_files(posted_line, remaining_lines):
-    """Update topost.txt and append to posted.txt"""
+def resolve_secret(target, key):
+    """Return target[key], or the environment variable named by target[key + '_env']"""
+    if target.get(key):
+        return target[key]
+    if target.get(key + '_env'):
+        return os.getenv(target[key + '_env'])
+    return None
+
+def load_targets():
+    """Return the list of accounts to post to
+    
+    Targets come from TARGETS_FILE when it exists, otherwise from the
+    BLUESKY_* and MASTODON_* environment variables (one account each).
+    Each target is a dict with 'name', 'platform' and the platform's
+    credentials. Exits with setup instructions if credentials are missing.
+    """
+    if not os.path.exists(TARGETS_FILE):
+        return default_targets()
+    
     try:
-        # Write remaining lines back to topost.txt
-        with open(TOPOST_FILE, 'w', encoding='utf-8') as f:
-            f.writelines(remaining_lines)
-        
-        # Append posted line to posted.txt with timestamp
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with open(POSTED_FILE, 'a', encoding='utf-8') as f:
-            f.write(f"[{timestamp}] {posted_line}\n")
-        
-        print(f"✓ Files updated successfully")
-        
+        with open(TARGETS_FILE, 'r', encoding='utf-8') as f:
+            config = json.load(f)
     except Exception as e:
-        print(f"Error updating files: {e}")
-        return False
+        print(f"❌ Error reading {TARGETS_FILE}: {e}")
+        sys.exit(1)
     
-    return True
-
-def main():
-    """Main function"""
-    print("Bluesky & Mastodon Auto-Poster with Link Embeds Starting...")
+    targets = []
+    for entry in config.get('targets', []):
+        platform = str(entry.get('platform', '')).lower()
+        if platform == 'bluesky':
+            target = {
+                'platform': 'bluesky',
+                'handle': entry.get('handle'),
+                'password': resolve_secret(entry, 'password'),
+                'service': entry.get('service'),
+            }
+            target['name'] = entry.get('name') or f"Bluesky ({target['handle']})"
+            missing = [key for key in ('handle', 'password') if not target[key]]
+        elif platform == 'mastodon':
+            target = {
+                'platform': 'mastodon',
+                'instance_url': entry.get('instance_url'),
+                'access_token': resolve_secret(entry, 'access_token'),
+            }
+            target['name'] = entry.get('name') or f"Mastodon ({urlparse(target['instance_url'] or '').netloc})"
+            missing = [key for key in ('instance_url', 'access_token') if not target[key]]
+        else:
+            print(f"❌ Unknown platform {entry.get('platform')!r} in {TARGETS_FILE}")
+            sys.exit(1)
+        
+        if missing:
+            print(f"❌ Target {target['name']!r} in {TARGETS_FILE} is missing: {', '.join(missing)}")
+            sys.exit(1)
+        if any(existing['name'] == target['name'] for existing in targets):
+            print(f"❌ Duplicate target name {target['name']!r} in {TARGETS_FILE}")
+            sys.exit(1)
+        targets.append(target)
+    
+    if not targets:
+        print(f"❌ No targets configured in {TARGETS_FILE}")
+        sys.exit(1)
     
+    return targets
+
+def default_targets():
+    """Build one Bluesky and one Mastodon target from environment variables"""
     # Check Bluesky credentials
     if BLUESKY_HANDLE == 'your-handle.bsky.social' or BLUESKY_PASSWORD == 'your-app-password':
         print("\n⚠️  Please set your Bluesky credentials:")
         print("   Set environment variables BLUESKY_HANDLE and BLUESKY_PASSWORD")
         print("   export BLUESKY_HANDLE='yourname.bsky.social'")
         print("   export BLUESKY_PASSWORD='your-app-password'")
+        print(f"   (or list your accounts in {TARGETS_FILE})")
         sys.exit(1)
     
     # Check Mastodon credentials
@@ -480,13 +1565,407 @@ def main():
         print("   3. Copy the access token")
         sys.exit(1)
     
-    # Read first line from topost.txt
-    line_to_post, remaining_lines = read_first_line()
-    if not line_to_post:
-        return
+    return [
+        {'name': 'Bluesky', 'platform': 'bluesky', 'handle': BLUESKY_HANDLE,
+         'password': BLUESKY_PASSWORD, 'service': None},
+        {'name': 'Mastodon', 'platform': 'mastodon', 'instance_url': MASTODON_INSTANCE_URL,
+         'access_token': MASTODON_ACCESS_TOKEN},
+    ]
+
+class RateLimiter:
+    """Token bucket pacing one account's API calls, corrected by the server's rate-limit headers
     
-    print(f"Content to post: {line_to_post}")
+    Calls wait for a token (RATE_LIMITS sets the sustained rate and burst per
+    platform). When the server reports a method's budget is used up, or
+    answers 429, calls to that method are held until its reset time instead
+    of failing, as long as that is within RATE_LIMIT_MAX_WAIT. Limits are per
+    endpoint, so only the method that reported them is held.
+    """
+    
+    def __init__(self, name, platform):
+        per_hour, burst = RATE_LIMITS[platform]
+        self.name = name
+        self.platform = platform
+        self.rate = per_hour / 3600.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = {}  # Wall-clock time the server asked us to wait for, per API method
+        self.local = threading.local()  # API method being called through this limiter on this thread
+        self.lock = threading.Lock()
+    
+    def current_method(self):
+        """Return the name of the paced API method running on this thread, or None"""
+        return getattr(self.local, 'method', None)
+    
+    def acquire(self, method):
+        """Block until method may be called, raising if its limit resets beyond RATE_LIMIT_MAX_WAIT"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                wait = self.blocked_until.get(method, 0) - time.time()
+                if wait > RATE_LIMIT_MAX_WAIT:
+                    print(f"⚠️  {self.name} rate limit for {method} resets in {wait:.0f}s, giving up for now")
+                    raise RuntimeError(f"{self.name} rate limit for {method} exhausted")
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            
+            time.sleep(min(wait, 60))
+    
+    def observe(self, method, remaining, reset):
+        """Apply rate-limit state reported by the server for method (remaining calls, reset epoch time)"""
+        if remaining is None:
+            return
+        try:
+            remaining = int(remaining)
+            reset = float(reset) if reset is not None else time.time() + 60
+        except (TypeError, ValueError):
+            return
+        
+        with self.lock:
+            if remaining <= 0:
+                self.blocked_until[method] = max(self.blocked_until.get(method, 0), reset)
+            else:
+                self.tokens = min(self.tokens, remaining)
+    
+    def reset_after_error(self, client, error):
+        """Return the reset time if error is a rate-limit rejection, else None"""
+        if self.platform == 'mastodon':
+            from mastodon import MastodonRatelimitError
+            if isinstance(error, MastodonRatelimitError):
+                return client.ratelimit_reset
+            return None
+        
+        response = getattr(error, 'response', None)
+        if response is None or response.status_code != 429:
+            return None
+        try:
+            return float(response.headers.get('ratelimit-reset'))
+        except (TypeError, ValueError):
+            return time.time() + 60
+    
+    def call(self, client, func, *args, **kwargs):
+        """Call func once a token is available, waiting out rate-limit rejections"""
+        method = func.__name__
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.acquire(method)
+            self.local.method = method
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                reset = self.reset_after_error(client, e)
+                if reset is None or attempt == RATE_LIMIT_RETRIES:
+                    raise
+                wait = reset - time.time()
+                if wait > RATE_LIMIT_MAX_WAIT:
+                    print(f"⚠️  {self.name} rate limit resets in {wait:.0f}s, giving up for now")
+                    raise
+                print(f"⏳ {self.name} rate limit reached, waiting {max(wait, 0):.0f}s...")
+                with self.lock:
+                    self.blocked_until[method] = max(self.blocked_until.get(method, 0), reset)
+                continue
+            finally:
+                self.local.method = None
+            
+            if self.platform == 'mastodon':
+                # Mastodon.py keeps the X-RateLimit-* headers of the last response
+                self.observe(method, client.ratelimit_remaining, client.ratelimit_reset)
+            return result
+
+# Stage names under which API calls are timed
+API_CALL_STAGES = {
+    'upload_blob': 'upload',
+    'media_post': 'upload',
+    'send_post': 'post',
+    'status_post': 'post',
+    'media': 'media_poll',
+}
+
+def rate_limited_call(client, func, *args, **kwargs):
+    """Call an API method of client through its account's RateLimiter, if it has one, timing the call"""
+    limiter = getattr(client, 'rate_limiter', None)
+    stage = API_CALL_STAGES.get(func.__name__, func.__name__)
+    with timed(stage, limiter.platform if limiter else '', target=limiter.name if limiter else ''):
+        if limiter is None:
+            return func(*args, **kwargs)
+        return limiter.call(client, func, *args, **kwargs)
+
+def bluesky_session_path(handle):
+    """Return the file holding the saved Bluesky session for handle"""
+    safe_handle = re.sub(r'[^A-Za-z0-9._-]', '_', handle)
+    return os.path.join(CACHE_DIR, f"bluesky_session_{safe_handle}")
+
+def save_bluesky_session(handle, session_string):
+    """Store a Bluesky session string, readable only by the current user"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        atomic_write(bluesky_session_path(handle), session_string.encode('utf-8'))  # mkstemp creates files as 0600
+    except Exception as e:
+        print(f"⚠️  Failed to save Bluesky session: {e}")
+
+def load_bluesky_session(handle):
+    """Return the saved Bluesky session string for handle, or None"""
+    try:
+        with open(bluesky_session_path(handle), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def connect_bluesky(target):
+    """Log in to a Bluesky account and return an authenticated client
+    
+    A session saved by a previous run is resumed (and refreshed by the client
+    when its access token expires) so createSession is only called when there
+    is no usable saved session.
+    """
+    from atproto import Client, SessionEvent
+    from atproto_client.request import Request
+    
+    print(f"Connecting to {target['name']}...")
+    limiter = RateLimiter(target['name'], 'bluesky')
+    
+    def on_response(response):
+        # Only paced calls count; login and session refreshes have their own (daily) budgets
+        method = limiter.current_method()
+        if method and '/com.atproto.server.' not in response.request.url.path:
+            limiter.observe(method, response.headers.get('ratelimit-remaining'), response.headers.get('ratelimit-reset'))
+    
+    client = Client(target.get('service'), request=Request(event_hooks={'response': [on_response]}))
+    client.rate_limiter = limiter
+    handle = target['handle']
+    
+    def on_session_change(event, session):
+        if event in (SessionEvent.CREATE, SessionEvent.REFRESH):
+            save_bluesky_session(handle, session.export())
+    
+    client.on_session_change(on_session_change)
     
+    session_string = load_bluesky_session(handle)
+    if session_string:
+        try:
+            client.login(session_string=session_string)
+            print(f"✓ Resumed saved {target['name']} session")
+            return client
+        except Exception as e:
+            print(f"⚠️  Saved {target['name']} session could not be resumed ({e}), logging in again")
+    
+    client.login(handle, target['password'])
+    print(f"✓ Successfully logged in to {target['name']}")
+    return client
+
+def mastodon_verification_key(target):
+    """Identify a Mastodon instance and token without storing the token itself"""
+    return hashlib.sha256(f"{target['instance_url']}|{target['access_token']}".encode('utf-8')).hexdigest()
+
+def recently_verified_mastodon(target):
+    """Return True if the target's credentials were verified within MASTODON_VERIFY_TTL"""
+    try:
+        with open(MASTODON_VERIFIED_FILE, 'r', encoding='utf-8') as f:
+            verified = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    
+    verified_at = verified.get(mastodon_verification_key(target), 0)
+    return time.time() - verified_at < MASTODON_VERIFY_TTL
+
+_mastodon_verified_lock = threading.Lock()
+
+def remember_mastodon_verification(target):
+    """Record a successful Mastodon credential check"""
+    try:
+        with _mastodon_verified_lock:
+            try:
+                with open(MASTODON_VERIFIED_FILE, 'r', encoding='utf-8') as f:
+                    verified = json.load(f)
+            except (FileNotFoundError, ValueError):
+                verified = {}
+            
+            verified[mastodon_verification_key(target)] = time.time()
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            atomic_write(MASTODON_VERIFIED_FILE, json.dumps(verified).encode('utf-8'))
+    except Exception as e:
+        print(f"⚠️  Failed to save Mastodon verification: {e}")
+
+def connect_mastodon(target):
+    """Connect to a Mastodon account and return a verified client
+    
+    The account_verify_credentials() probe is skipped when the same
+    credentials were verified within MASTODON_VERIFY_TTL.
+    """
+    from mastodon import Mastodon
+    
+    print(f"Connecting to {target['name']}...")
+    mastodon_client = Mastodon(
+        access_token=target['access_token'],
+        api_base_url=target['instance_url'],
+        ratelimit_method='throw'  # Rate limits are handled by our RateLimiter
+    )
+    mastodon_client.rate_limiter = RateLimiter(target['name'], 'mastodon')
+    
+    if recently_verified_mastodon(target):
+        print(f"✓ {target['name']} credentials recently verified, skipping check")
+        return mastodon_client
+    
+    # Test the connection
+    mastodon_client.account_verify_credentials()
+    remember_mastodon_verification(target)
+    print(f"✓ Successfully connected to {target['name']}")
+    return mastodon_client
+
+def post_to_bluesky(target, clients, parsed_content, text_content, metadata, image_data, idempotency_key=None):
+    """Create the post on a Bluesky account (logging in on first use), returning its URI or None
+    
+    idempotency_key is accepted for a uniform pipeline signature; Bluesky has no equivalent.
+    """
+    name = target['name']
+    bluesky_client = clients.get(name)
+    if bluesky_client is None:
+        try:
+            with timed('login', 'bluesky', target=name):
+                bluesky_client = clients[name] = connect_bluesky(target)
+        except Exception as e:
+            print(f"❌ Error connecting to {name}: {e}")
+            return None
+    
+    if parsed_content['type'] == 'url' and metadata:
+        print(f"Creating {name} post with embedded link...")
+        bluesky_response = create_bluesky_post_with_embed(bluesky_client, parsed_content['url'], text_content, metadata, image_data)
+    elif parsed_content['type'] == 'image' and image_data:
+        print(f"Creating {name} post with image...")
+        bluesky_response = create_bluesky_image_post(bluesky_client, image_data, text_content)
+    else:
+        print(f"Creating simple {name} text post...")
+        bluesky_response = create_simple_bluesky_post(bluesky_client, text_content)
+    
+    if bluesky_response:
+        print(f"✓ {name} post created successfully!")
+        print(f"{name} Post URI: {bluesky_response.uri}")
+        return bluesky_response.uri
+    
+    print(f"❌ Failed to create {name} post")
+    return None
+
+def post_to_mastodon(target, clients, parsed_content, text_content, metadata, image_data, idempotency_key=None):
+    """Create the post on a Mastodon account (connecting on first use), returning its URL or None
+    
+    Mastodon returns the status already created under idempotency_key (for
+    an hour) instead of posting again, so a retry after a timed out request
+    can't duplicate the toot.
+    """
+    name = target['name']
+    mastodon_client = clients.get(name)
+    if mastodon_client is None:
+        try:
+            with timed('login', 'mastodon', target=name):
+                mastodon_client = clients[name] = connect_mastodon(target)
+        except Exception as e:
+            print(f"❌ Error connecting to {name}: {e}")
+            return None
+    
+    if parsed_content['type'] == 'url':
+        print(f"Creating {name} post with link...")
+        mastodon_response = create_mastodon_post(mastodon_client, text_content, parsed_content['url'], image_data,
+                                                 idempotency_key)
+    elif parsed_content['type'] == 'image' and image_data:
+        print(f"Creating {name} post with image...")
+        mastodon_response = create_mastodon_image_post(mastodon_client, image_data, text_content, idempotency_key)
+    else:
+        print(f"Creating simple {name} text post...")
+        mastodon_response = create_simple_mastodon_post(mastodon_client, text_content, idempotency_key)
+    
+    if mastodon_response:
+        print(f"✓ {name} post created successfully!")
+        print(f"{name} Post URL: {mastodon_response['url']}")
+        return mastodon_response['url']
+    
+    print(f"❌ Failed to create {name} post")
+    return None
+
+# Each platform's login + upload + post pipeline, run side by side by dispatch_posts()
+PLATFORM_PIPELINES = {
+    'bluesky': post_to_bluesky,
+    'mastodon': post_to_mastodon,
+}
+
+def platform_image_data(image_data, platform):
+    """Pick a platform's encoding from prepared image data (one image's encodings, or a list of them)"""
+    if image_data is None:
+        return None
+    if isinstance(image_data, list):
+        return [variants[platform] for variants in image_data]
+    return image_data[platform]
+
+def run_pipeline(target, clients, item_id, *payload):
+    """Run one target's posting pipeline, timing it end to end"""
+    # The same item and target always get the same key, however often the delivery is retried
+    idempotency_key = f"{item_id}:{target['name']}" if item_id else None
+    with timed('publish', target['platform'], target=target['name']) as span:
+        remote_ref = PLATFORM_PIPELINES[target['platform']](target, clients, *payload, idempotency_key=idempotency_key)
+        if not remote_ref:
+            span['status'] = 'error'
+        return remote_ref
+
+def dispatch_posts(targets, parsed_content, text_content, metadata, image_data, clients=None, item_id=None):
+    """Post one prepared payload to every target concurrently and return {target name: post URI/URL or None}
+    
+    clients maps target name to an authenticated client. Pipelines log in on
+    first use and store their client there, so passing the same dict across
+    calls keeps the sessions alive. At most MAX_POST_WORKERS targets are
+    handled at once. item_id (the delivery ledger's) makes retried posts
+    idempotent where the platform supports it.
+    """
+    if clients is None:
+        clients = {}
+    
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(MAX_POST_WORKERS, len(targets))) as executor:
+        futures = {
+            target['name']: executor.submit(run_pipeline, target, clients, item_id,
+                                            parsed_content, text_content, metadata,
+                                            platform_image_data(image_data, target['platform']))
+            for target in targets
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"❌ Error posting to {name}: {e}")
+                results[name] = None
+    
+    return results
+
+def update_files(posted_line, position):
+    """Mark posted_line as posted in topost.txt and append it to posted.txt"""
+    try:
+        commit_position(position)
+        
+        # Append posted line to posted.txt with timestamp
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(POSTED_FILE, 'a', encoding='utf-8') as f:
+            f.write(f"[{timestamp}] {posted_line}\n")
+        
+        print(f"✓ Files updated successfully")
+        
+    except Exception as e:
+        print(f"Error updating files: {e}")
+        return False
+    
+    return True
+
+def prepare_content(line_to_post, platforms=tuple(IMAGE_CONSTRAINTS)):
+    """Parse a queue line and fetch everything needed to post it to the given platforms
+    
+    Returns (parsed_content, text_content, metadata, image_data), or None if
+    the line cannot be posted (e.g. its local image is missing). Images are
+    encoded for each platform as {platform: bytes}; image_data is one such
+    dict for a link card image, or a list of them for image posts.
+    """
     # Parse the line
     parsed_content = parse_line(line_to_post)
     
@@ -509,27 +1988,31 @@ def main():
         # Download image if available (we'll use it for both platforms)
         if metadata['image_url']:
             print(f"Downloading featured image: {metadata['image_url']}")
-            image_data = download_and_process_image(metadata['image_url'])
+            image_data = download_and_process_image(metadata['image_url'], platforms)
             if image_data:
                 print("✓ Image downloaded successfully")
             else:
                 print("⚠️  Failed to download image")
     
     elif parsed_content['type'] == 'image':
-        filename = parsed_content['filename']
+        filenames = parsed_content['filenames']
         text_content = parsed_content['caption']
         
-        print(f"Local image: {filename}")
+        print(f"Local image(s): {', '.join(filenames)}")
         print(f"Caption: {text_content}")
         
-        # Load local image
-        print("Loading local image...")
-        image_data = load_local_image(filename)
+        if len(filenames) > MAX_IMAGES_PER_POST:
+            print(f"❌ Too many images: {len(filenames)} (at most {MAX_IMAGES_PER_POST} per post)")
+            return None
+        
+        # Load local images
+        print("Loading local images...")
+        image_data = load_local_images(filenames, platforms)
         if image_data:
-            print("✓ Local image loaded successfully")
+            print(f"✓ {len(image_data)} local image(s) loaded successfully")
         else:
-            print("❌ Failed to load local image")
-            return
+            print("❌ Failed to load local images")
+            return None
         
         metadata = None
     
@@ -538,80 +2021,607 @@ def main():
         print(f"Simple text post: {text_content}")
         metadata = None
     
+    return parsed_content, text_content, metadata, image_data
+
+@contextmanager
+def delivery_ledger():
+    """Open the per-target delivery ledger, creating it on first use"""
+    conn = sqlite3.connect(DELIVERY_LEDGER_FILE, timeout=30)
     try:
-        # Initialize clients
-        print("Connecting to Bluesky...")
-        bluesky_client = Client()
-        bluesky_client.login(BLUESKY_HANDLE, BLUESKY_PASSWORD)
-        print("✓ Successfully logged in to Bluesky")
-        
-        print("Connecting to Mastodon...")
-        mastodon_client = Mastodon(
-            access_token=MASTODON_ACCESS_TOKEN,
-            api_base_url=MASTODON_INSTANCE_URL
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " item_id TEXT PRIMARY KEY, line TEXT, committed INTEGER, created_at REAL)"
         )
-        # Test the connection
-        mastodon_client.account_verify_credentials()
-        print("✓ Successfully connected to Mastodon")
-        
-        # Post to both platforms
-        bluesky_success = False
-        mastodon_success = False
-        
-        # Post to Bluesky
-        if parsed_content['type'] == 'url' and metadata:
-            print("Creating Bluesky post with embedded link...")
-            bluesky_response = create_bluesky_post_with_embed(bluesky_client, parsed_content['url'], text_content, metadata)
-        elif parsed_content['type'] == 'image' and image_data:
-            print("Creating Bluesky post with image...")
-            bluesky_response = create_bluesky_image_post(bluesky_client, image_data, text_content)
-        else:
-            print("Creating simple Bluesky text post...")
-            bluesky_response = create_simple_bluesky_post(bluesky_client, text_content)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            " item_id TEXT, target TEXT, status TEXT, attempts INTEGER, remote_ref TEXT,"
+            " last_error TEXT, next_attempt_at REAL, updated_at REAL,"
+            " PRIMARY KEY (item_id, target))"
+        )
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def ledger_item(line):
+    """Return (item_id, {target: status}) for the uncommitted queue item holding line"""
+    with delivery_ledger() as conn:
+        row = conn.execute(
+            "SELECT item_id FROM items WHERE line = ? AND committed = 0 ORDER BY created_at LIMIT 1", (line,)
+        ).fetchone()
+        if row is None:
+            item_id = uuid.uuid4().hex
+            conn.execute("INSERT INTO items VALUES (?, ?, 0, ?)", (item_id, line, time.time()))
+            return item_id, {}
         
-        if bluesky_response:
-            print("✓ Bluesky post created successfully!")
-            print(f"Bluesky Post URI: {bluesky_response.uri}")
-            bluesky_success = True
-        else:
-            print("❌ Failed to create Bluesky post")
-        
-        # Post to Mastodon
-        if parsed_content['type'] == 'url':
-            print("Creating Mastodon post with link...")
-            mastodon_response = create_mastodon_post(mastodon_client, text_content, parsed_content['url'], image_data)
-        elif parsed_content['type'] == 'image' and image_data:
-            print("Creating Mastodon post with image...")
-            mastodon_response = create_mastodon_image_post(mastodon_client, image_data, text_content)
-        else:
-            print("Creating simple Mastodon text post...")
-            mastodon_response = create_simple_mastodon_post(mastodon_client, text_content)
+        item_id = row[0]
+        statuses = dict(conn.execute("SELECT target, status FROM deliveries WHERE item_id = ?", (item_id,)))
+        return item_id, statuses
+
+def record_deliveries(item_id, results):
+    """Store the outcome of posting an item to each target in results ({target: ref or None})"""
+    now = time.time()
+    with delivery_ledger() as conn:
+        for target, remote_ref in results.items():
+            row = conn.execute(
+                "SELECT attempts FROM deliveries WHERE item_id = ? AND target = ?", (item_id, target)
+            ).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            if remote_ref:
+                status, next_attempt_at = 'sent', None
+            else:
+                status = 'failed'
+                next_attempt_at = now + min(DELIVERY_RETRY_BASE * 2 ** (attempts - 1), DELIVERY_RETRY_MAX)
+            conn.execute(
+                "INSERT OR REPLACE INTO deliveries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (item_id, target, status, attempts, remote_ref, None if remote_ref else 'post failed',
+                 next_attempt_at, now)
+            )
+
+def mark_item_committed(item_id):
+    """Record that an item has left topost.txt, so only its failed targets are retried"""
+    with delivery_ledger() as conn:
+        conn.execute("UPDATE items SET committed = 1 WHERE item_id = ?", (item_id,))
+
+def normalize_url(url):
+    """Reduce a URL to a canonical form so trivially different links to the same page compare equal"""
+    if url.startswith('www.'):
+        url = 'https://' + url
+    parts = urlparse(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.lower().startswith(TRACKING_PARAMS))
+    return urlunparse(('https', host, parts.path.rstrip('/') or '/', '', urlencode(query), ''))
+
+def duplicate_keys(line):
+    """Return the index keys identifying the content of a queue line
+    
+    URL posts are identified by their normalized URL, image posts by the
+    content hash of each image, and text posts by a hash of their text.
+    Images missing from the images folder produce no key.
+    """
+    parsed_content = parse_line(line)
+    if parsed_content['type'] == 'url':
+        return ['url:' + normalize_url(parsed_content['url'])]
+    
+    if parsed_content['type'] == 'image':
+        keys = []
+        for filename in parsed_content['filenames']:
+            try:
+                with open(os.path.join('images', filename), 'rb') as f:
+                    keys.append('image:' + hashlib.sha256(f.read()).hexdigest())
+            except OSError:
+                pass
+        return keys
+    
+    text = ' '.join(parsed_content['content'].casefold().split())
+    return ['text:' + hashlib.sha256(text.encode('utf-8')).hexdigest()]
+
+@contextmanager
+def posted_index():
+    """Open the index of posted content, bringing it up to date with posted.txt first
+    
+    Only the part of posted.txt appended since the last update is read. If
+    the archive was truncated or replaced, the index is rebuilt from scratch.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(POSTED_INDEX_FILE, timeout=30)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS posted (key TEXT PRIMARY KEY, posted_at REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value TEXT)")
+        with conn:
+            state = dict(conn.execute("SELECT name, value FROM state"))
+            offset = int(state.get('offset', 0))
+            head = state.get('head', '')
+            
+            try:
+                with open(POSTED_FILE, 'rb') as f:
+                    # The start of the archive identifies it, in case it was replaced
+                    indexed_head = hashlib.sha256(f.read(min(offset, 256))).hexdigest()
+                    if os.fstat(f.fileno()).st_size < offset or (offset and indexed_head != head):
+                        conn.execute("DELETE FROM posted")
+                        offset = 0
+                    
+                    f.seek(offset)
+                    for raw in iter(f.readline, b''):
+                        if not raw.endswith(b'\n'):
+                            break  # Line still being written
+                        offset += len(raw)
+                        match = POSTED_LINE_PATTERN.match(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+                        if not match:
+                            continue
+                        posted_at = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S').timestamp()
+                        for key in duplicate_keys(match.group(2)):
+                            conn.execute(
+                                "INSERT INTO posted VALUES (?, ?) ON CONFLICT(key)"
+                                " DO UPDATE SET posted_at = max(posted_at, excluded.posted_at)",
+                                (key, posted_at)
+                            )
+                    
+                    f.seek(0)
+                    head = hashlib.sha256(f.read(min(offset, 256))).hexdigest()
+            except FileNotFoundError:
+                offset, head = 0, ''
+            
+            conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?)",
+                             [('offset', str(offset)), ('head', head)])
+            yield conn
+    finally:
+        conn.close()
+
+def find_duplicate(line):
+    """Return when the content of line was last posted if that is within the repost window, else None"""
+    if REPOST_WINDOW_DAYS <= 0:
+        return None
+    
+    keys = duplicate_keys(line)
+    if not keys:
+        return None
+    
+    with posted_index() as conn:
+        posted_times = []
+        for key in keys:
+            row = conn.execute("SELECT posted_at FROM posted WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None  # Something in this item is new
+            posted_times.append(row[0])
+    
+    last_posted = min(posted_times)
+    if time.time() - last_posted > REPOST_WINDOW_DAYS * 24 * 60 * 60:
+        return None
+    return datetime.fromtimestamp(last_posted)
+
+def skip_duplicate(line, position):
+    """Drop line from the queue without posting it if its content was posted recently, returning True if so"""
+    try:
+        posted_at = find_duplicate(line)
+    except Exception as e:
+        print(f"⚠️  Duplicate check failed, posting anyway: {e}")
+        return False
+    
+    if posted_at is None:
+        return False
+    
+    print(f"⏭️  Skipping, already posted on {posted_at:%Y-%m-%d %H:%M}: {line}")
+    commit_position(position)
+    return True
+
+def post_line(targets, line_to_post, position, clients):
+    """Prepare and post one queue line, returning True once it is moved to posted.txt
+    
+    Targets that already received this line in an earlier attempt are
+    skipped. Once at least one target has it, the line is committed and any
+    failed targets are left to retry_failed_deliveries().
+    """
+    print(f"Content to post: {line_to_post}")
+    
+    item_id, statuses = ledger_item(line_to_post)
+    pending_targets = [target for target in targets if statuses.get(target['name']) != 'sent']
+    already_sent = [name for name, status in statuses.items() if status == 'sent']
+    if already_sent:
+        print(f"Already posted to: {', '.join(already_sent)}")
+    
+    results = {}
+    if pending_targets:
+        content = prepare_content(line_to_post, {target['platform'] for target in pending_targets})
+        if content is None:
+            return False
         
-        if mastodon_response:
-            print("✓ Mastodon post created successfully!")
-            print(f"Mastodon Post URL: {mastodon_response['url']}")
-            mastodon_success = True
+        # Post to every remaining target concurrently
+        results = dispatch_posts(pending_targets, *content, clients, item_id)
+        record_deliveries(item_id, results)
+    
+    # Update files only if at least one post was successful
+    success_targets = already_sent + [name for name, remote_ref in results.items() if remote_ref]
+    if not success_targets:
+        print("❌ Failed to post to any target")
+        return False
+    
+    if update_files(line_to_post, position):
+        mark_item_committed(item_id)
+        failed_targets = [name for name, remote_ref in results.items() if not remote_ref]
+        if failed_targets:
+            print(f"⚠️  Will retry later: {', '.join(failed_targets)}")
+        print(f"✓ Process completed successfully! Posted to: {', '.join(success_targets)}")
+        return True
+    
+    print(f"⚠️  Posts were created on {', '.join(success_targets)} but file update failed")
+    return False
+
+def retry_failed_deliveries(targets, clients):
+    """Re-post already committed items to the targets that failed them, once their backoff expires"""
+    targets_by_name = {target['name']: target for target in targets}
+    with delivery_ledger() as conn:
+        rows = conn.execute(
+            "SELECT d.item_id, i.line, d.target, d.attempts FROM deliveries d"
+            " JOIN items i ON i.item_id = d.item_id"
+            " WHERE i.committed = 1 AND d.status = 'failed' AND d.next_attempt_at <= ?"
+            " ORDER BY i.created_at", (time.time(),)
+        ).fetchall()
+    
+    retries = {}
+    for item_id, line, target_name, attempts in rows:
+        if target_name not in targets_by_name:
+            continue
+        if attempts >= MAX_DELIVERY_ATTEMPTS:
+            with delivery_ledger() as conn:
+                conn.execute(
+                    "UPDATE deliveries SET status = 'abandoned' WHERE item_id = ? AND target = ?",
+                    (item_id, target_name)
+                )
+            print(f"❌ Giving up on posting to {target_name} after {attempts} attempts: {line}")
+            continue
+        retries.setdefault((item_id, line), []).append(targets_by_name[target_name])
+    
+    for (item_id, line), retry_targets in retries.items():
+        print(f"Retrying on {', '.join(target['name'] for target in retry_targets)}: {line}")
+        content = prepare_content(line, {target['platform'] for target in retry_targets})
+        if content is None:
+            record_deliveries(item_id, {target['name']: None for target in retry_targets})
+            continue
+        
+        results = dispatch_posts(retry_targets, *content, clients, item_id)
+        record_deliveries(item_id, results)
+
+def prefetch_line(line):
+    """Fetch metadata and process images for one queue line so posting it later is fast"""
+    parsed_content = parse_line(line)
+    
+    if parsed_content['type'] == 'url':
+        metadata = fetch_page_metadata(parsed_content['url'])
+        if metadata['image_url'] and not download_and_process_image(metadata['image_url'], tuple(IMAGE_CONSTRAINTS)):
+            return False
+    elif parsed_content['type'] == 'image':
+        if not load_local_images(parsed_content['filenames'][:MAX_IMAGES_PER_POST], tuple(IMAGE_CONSTRAINTS)):
+            return False
+    
+    return True
+
+def prefetch(count):
+    """Prepare the next count queue items concurrently ahead of posting time"""
+    lines = peek_queue(count)
+    if not lines:
+        print("No content to prefetch - topost.txt is empty")
+        return
+    
+    print(f"Prefetching {len(lines)} upcoming item(s)...")
+    with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+        results = list(executor.map(prefetch_line, lines))
+    
+    failed = results.count(False)
+    if failed:
+        print(f"⚠️  Prefetched {len(lines) - failed} item(s), {failed} had problems")
+    else:
+        print(f"✓ Prefetched {len(lines)} item(s)")
+
+def grapheme_length(text):
+    """Count user-perceived characters the way Bluesky and Mastodon do, approximately
+    
+    Combining marks, variation selectors, emoji skin tones and ZWJ sequences
+    count towards the preceding character, and flag emoji (regional
+    indicator pairs) and CRLF count as one.
+    """
+    count = 0
+    joined = False
+    regional_indicators = 0
+    previous = ''
+    for char in text:
+        code = ord(char)
+        if joined:
+            joined = False
+        elif char == '\u200d':
+            joined = True
+        elif (unicodedata.category(char) in ('Mn', 'Me') or 0xFE00 <= code <= 0xFE0F
+                or 0x1F3FB <= code <= 0x1F3FF or 0xE0020 <= code <= 0xE007F):
+            pass
+        elif char == '\n' and previous == '\r':
+            pass
+        elif 0x1F1E6 <= code <= 0x1F1FF:
+            regional_indicators += 1
+            if regional_indicators % 2:
+                count += 1
         else:
-            print("❌ Failed to create Mastodon post")
-        
-        # Update files only if at least one post was successful
-        if bluesky_success or mastodon_success:
-            success_platforms = []
-            if bluesky_success:
-                success_platforms.append("Bluesky")
-            if mastodon_success:
-                success_platforms.append("Mastodon")
+            count += 1
+        if not 0x1F1E6 <= code <= 0x1F1FF:
+            regional_indicators = 0
+        previous = char
+    return count
+
+def problem(severity, check, message):
+    """Build one entry of the queue check report"""
+    return {'severity': severity, 'check': check, 'message': message}
+
+def check_url(url):
+    """Check that a link can be fetched and has a reachable featured image, returning a list of problems"""
+    cached = get_cached_metadata(url)
+    if cached and time.time() - cached['fetched_at'] < METADATA_CACHE_TTL:
+        metadata = cached['metadata']
+    else:
+        try:
+            with http_get(url, timeout=10, stream=True) as response:
+                response.raise_for_status()
+                metadata = read_head_metadata(response, url)
+                store_cached_metadata(url, metadata, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        except Exception as e:
+            return [problem('error', 'link', f"Link cannot be fetched: {e}")]
+    
+    if not metadata['image_url']:
+        return [problem('warning', 'link_image', "Page has no og:image, the link card will have no picture")]
+    
+    # Only the headers of the image are needed
+    try:
+        with http_get(metadata['image_url'], timeout=10, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+    except Exception as e:
+        return [problem('warning', 'link_image', f"Featured image {metadata['image_url']} cannot be fetched: {e}")]
+    
+    if not content_type.startswith('image/'):
+        return [problem('warning', 'link_image', f"Featured image {metadata['image_url']} is {content_type or 'not an image'}")]
+    return []
+
+def check_image_file(filename):
+    """Check that a local image exists and can be read, looking at its header only"""
+    from PIL import Image
+    
+    image_path = os.path.join('images', filename)
+    try:
+        with Image.open(image_path) as img:
+            image_format = img.format
+    except FileNotFoundError:
+        return [problem('error', 'image', f"Image file not found: {image_path}")]
+    except Exception as e:
+        return [problem('error', 'image', f"Image file {image_path} cannot be read: {e}")]
+    
+    # Posting goes by the content, but a wrong extension usually means the wrong file
+    extension = os.path.splitext(filename)[1].lower()
+    expected = Image.registered_extensions().get(extension)
+    if image_format == 'MPO':
+        image_format = 'JPEG'  # Multi-picture JPEGs from phones and cameras
+    if expected and image_format != expected:
+        return [problem('warning', 'image', f"Image file {image_path} is {image_format}, not {extension}")]
+    return []
+
+def check_text_length(parsed_content):
+    """Check a parsed line's post text against each platform's length limit"""
+    if parsed_content['type'] == 'url':
+        text = parsed_content['comment']
+        # Bluesky shows the link as a card; Mastodon appends it to the text
+        lengths = {'bluesky': grapheme_length(text), 'mastodon': grapheme_length(text) + 2 + MASTODON_URL_LENGTH}
+    else:
+        text = parsed_content['caption'] if parsed_content['type'] == 'image' else parsed_content['content']
+        links = re.findall(r'https?://\S+', text)
+        lengths = {
+            'bluesky': grapheme_length(text),
+            'mastodon': grapheme_length(re.sub(r'https?://\S+', '', text)) + MASTODON_URL_LENGTH * len(links),
+        }
+    
+    return [
+        problem('error', 'length', f"Too long for {platform}: {length} of {POST_LENGTH_LIMITS[platform]} characters")
+        for platform, length in lengths.items() if length > POST_LENGTH_LIMITS[platform]
+    ]
+
+def check_queue(report_path):
+    """Validate every unposted queue line concurrently and write a JSON report, returning the number of errors
+    
+    Each distinct link and image file is checked once, however many lines
+    use it. Link checks reuse fresh link preview cache entries and store
+    what they fetch, so they also warm the cache for posting.
+    """
+    try:
+        with open(TOPOST_FILE, 'rb') as f:
+            items = [(start, line, parse_line(line)) for start, _, line in iter_pending(f, load_cursor())]
+    except FileNotFoundError:
+        print(f"Error: {TOPOST_FILE} not found")
+        return 1
+    
+    urls = {parsed['url'] for _, _, parsed in items if parsed['type'] == 'url'}
+    filenames = {name for _, _, parsed in items if parsed['type'] == 'image' for name in parsed['filenames']}
+    print(f"Checking {len(items)} queued item(s): {len(urls)} link(s), {len(filenames)} image file(s)...")
+    
+    with ThreadPoolExecutor(max_workers=CHECK_WORKERS) as executor:
+        url_futures = {url: executor.submit(check_url, url) for url in urls}
+        file_futures = {name: executor.submit(check_image_file, name) for name in filenames}
+        url_problems = {url: future.result() for url, future in url_futures.items()}
+        file_problems = {name: future.result() for name, future in file_futures.items()}
+    
+    results = []
+    for start, line, parsed in items:
+        problems = check_text_length(parsed)
+        if parsed['type'] == 'url':
+            problems += url_problems[parsed['url']]
+        elif parsed['type'] == 'image':
+            if len(parsed['filenames']) > MAX_IMAGES_PER_POST:
+                problems.append(problem('error', 'image', f"{len(parsed['filenames'])} images, at most {MAX_IMAGES_PER_POST} per post"))
+            for name in parsed['filenames']:
+                problems += file_problems[name]
+        if problems:
+            results.append({'offset': start, 'line': line, 'problems': problems})
+    
+    errors = sum(entry['severity'] == 'error' for result in results for entry in result['problems'])
+    warnings = sum(entry['severity'] == 'warning' for result in results for entry in result['problems'])
+    report = {
+        'checked_at': datetime.now().isoformat(timespec='seconds'),
+        'queue': TOPOST_FILE,
+        'items': len(items),
+        'errors': errors,
+        'warnings': warnings,
+        'results': results,
+    }
+    
+    for result in results:
+        for entry in result['problems']:
+            icon = '❌' if entry['severity'] == 'error' else '⚠️ '
+            line = result['line'] if len(result['line']) <= 80 else result['line'][:77] + '...'
+            print(f"{icon} {entry['message']}: {line}")
+    
+    if report_path == '-':
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        atomic_write(report_path, json.dumps(report, indent=2, ensure_ascii=False).encode('utf-8'))
+        print(f"Report written to {report_path}")
+    
+    print(f"{'✓' if not errors else '❌'} Checked {len(items)} item(s): {errors} error(s), {warnings} warning(s)")
+    return errors
+
+def run_daemon(targets, pace):
+    """Keep running, posting each queue line as soon as it is due
+    
+    New lines appended to topost.txt are picked up within
+    DAEMON_POLL_INTERVAL seconds; scheduled lines are posted at their time.
+    """
+    index = ScheduleIndex()
+    clients = {}
+    last_retry = 0
+    print(f"Daemon started, watching {TOPOST_FILE} (Ctrl+C to stop)")
+    
+    try:
+        while True:
+            if time.time() - last_retry >= DELIVERY_RETRY_BASE:
+                retry_failed_deliveries(targets, clients)
+                clear_media_cache()
+                last_retry = time.time()
             
-            if update_files(line_to_post, remaining_lines):
-                print(f"✓ Process completed successfully! Posted to: {', '.join(success_platforms)}")
-            else:
-                print(f"⚠️  Posts were created on {', '.join(success_platforms)} but file update failed")
-        else:
-            print("❌ Failed to post to both platforms")
+            index.refresh()
+            item = index.pop_due(time.time())
+            if item is None:
+                next_due = index.next_due()
+                wait = DAEMON_POLL_INTERVAL if next_due is None else min(DAEMON_POLL_INTERVAL, next_due - time.time())
+                time.sleep(max(wait, 0.1))
+                continue
+            
+            due, start, end, line = item
+            skipped = False
+            try:
+                skipped = skip_duplicate(line, (start, end))
+                posted = skipped or post_line(targets, line, (start, end), clients)
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                posted = False
+            
+            clear_media_cache()
+            write_metrics()
+            if not posted:
+                print(f"Will try again in {DAEMON_RETRY_DELAY // 60} minutes")
+                index.push(time.time() + DAEMON_RETRY_DELAY, start, end, line)
+            elif os.path.getsize(TOPOST_FILE) == 0:
+                # The queue was drained and truncated, so indexed offsets are stale
+                index.reset()
+            
+            if pace > 0 and not skipped:
+                time.sleep(pace)
+    
+    except KeyboardInterrupt:
+        print("Daemon stopped")
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Post queued content from topost.txt to Bluesky and Mastodon")
+    parser.add_argument('command', nargs='?', default='post', choices=('post', 'prefetch', 'daemon', 'check'),
+                        help="post queued items (default), prefetch link previews and images for upcoming ones, "
+                             "run continuously and post each item when it is due, or check the whole queue for problems")
+    drain_group = parser.add_mutually_exclusive_group()
+    drain_group.add_argument('--drain', type=int, default=1, metavar='N',
+                             help="post up to N queue items in this run (default: 1)")
+    drain_group.add_argument('--until-empty', action='store_true',
+                             help="keep posting until topost.txt is empty")
+    parser.add_argument('--compact', action='store_true',
+                        help="rewrite topost.txt without already posted lines and exit")
+    parser.add_argument('--pace', type=float, default=0, metavar='SECONDS',
+                        help="seconds to wait between posts when draining or in daemon mode (default: 0)")
+    parser.add_argument('--count', type=int, default=10, metavar='K',
+                        help="number of upcoming items to prepare with prefetch (default: 10)")
+    parser.add_argument('--report', default=CHECK_REPORT_FILE, metavar='FILE',
+                        help=f"where check writes its JSON report, or - for stdout (default: {CHECK_REPORT_FILE})")
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    args = parse_args()
+    atexit.register(write_metrics)
+    
+    print("Bluesky & Mastodon Auto-Poster with Link Embeds Starting...")
+    
+    if args.compact:
+        compact_queue()
+        return
+    
+    if args.command == 'prefetch':
+        prefetch(args.count)
+        return
+    
+    if args.command == 'check':
+        if check_queue(args.report):
+            sys.exit(1)
+        return
+    
+    targets = load_targets()
+    
+    if args.command == 'daemon':
+        run_daemon(targets, args.pace)
+        return
+    
+    # Clients are created on first use and reused for every item in this run
+    clients = {}
+    limit = None if args.until_empty else args.drain
+    posted_count = 0
+    
+    try:
+        # Catch up on targets that failed earlier items before posting new ones
+        retry_failed_deliveries(targets, clients)
+        clear_media_cache()
+        
+        while limit is None or posted_count < limit:
+            # Read first line from topost.txt
+            line_to_post, position = read_first_line()
+            if not line_to_post:
+                break
+            
+            if skip_duplicate(line_to_post, position):
+                continue
+            
+            if posted_count and args.pace > 0:
+                print(f"Waiting {args.pace:g}s before the next post...")
+                time.sleep(args.pace)
+            
+            posted = post_line(targets, line_to_post, position, clients)
+            clear_media_cache()
+            if not posted:
+                # Leave the line at the head of the queue for the next run
+                break
+            
+            posted_count += 1
     
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
+    
+    if limit != 1:
+        print(f"✓ Drain finished: {posted_count} item(s) posted")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,70 @@
+"""Regression tests for the topost.txt cursor (run with: python -m unittest discover tests)"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+class CursorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def write_queue(self, data):
+        with open(main.TOPOST_FILE, 'wb') as f:
+            f.write(data)
+
+    def take(self, count):
+        """Read and commit up to count lines, returning them and what was printed"""
+        lines = []
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            for _ in range(count):
+                line, position = main.read_first_line()
+                if not line:
+                    break
+                lines.append(line)
+                main.commit_position(position)
+        return lines, output.getvalue()
+
+    def test_crlf_queue_with_repeated_lines(self):
+        self.write_queue(b'hello\r\nsecond\r\nhello\r\nthird\r\nfourth\r\n')
+
+        lines, output = self.take(3)
+        self.assertEqual(lines, ['hello', 'second', 'hello'])
+        # The cursor still matches the file, so it must not be resynced
+        self.assertNotIn('changed since the last run', output)
+
+        lines, output = self.take(10)
+        self.assertEqual(lines, ['third', 'fourth'])
+        self.assertNotIn('changed since the last run', output)
+
+    def test_resync_picks_nearest_repeated_line(self):
+        self.write_queue(b'hello\nsecond\nhello\nthird\n')
+        self.assertEqual(self.take(3)[0], ['hello', 'second', 'hello'])
+
+        # A line inserted before the cursor shifts the offsets; the second
+        # 'hello' is still the one nearest the saved position
+        with open(main.TOPOST_FILE, 'rb') as f:
+            data = f.read()
+        self.write_queue(b'x\n' + data)
+
+        lines, output = self.take(10)
+        self.assertIn('changed since the last run', output)
+        self.assertEqual(lines, ['third'])
+
+
+if __name__ == '__main__':
+    unittest.main()